@@ -1,5 +1,7 @@
 from dyndis.multidispatch import MultiDispatch
-from dyndis.exceptions import AmbiguityError
+from dyndis.async_multidispatch import AsyncMultiDispatch
+from dyndis.exceptions import AmbiguityError, FrozenDispatchError
+from dyndis.tracing import TraceEvent
 from dyndis._version import __version__
 
-__all__ = ['MultiDispatch', 'AmbiguityError', '__version__']
+__all__ = ['MultiDispatch', 'AsyncMultiDispatch', 'AmbiguityError', 'FrozenDispatchError', 'TraceEvent', '__version__']
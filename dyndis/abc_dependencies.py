@@ -0,0 +1,69 @@
+from typing import FrozenSet, Iterable, List, Set, Tuple
+
+from dyndis.annotation_filter import AnnotationFilter, has_nominal_subclass_check, has_static_subclass_check
+
+
+class AbcDependencies:
+    """
+    Tracks which classes with a non-nominal subclass check (usually ABCs) the candidates of a single arity depend on.
+     When the ABC cache token changes (due to `ABC.register`), only results that depend on these classes can change.
+    """
+
+    def __init__(self, arity: int):
+        self.filter_classes: Set[type] = set()
+        self.dynamic_classes: Set[type] = set()
+        # the dynamic classes, by the argument position that is checked against them
+        self.positional: List[Set[type]] = [set() for _ in range(arity)]
+        self.binds_arg_types = False
+
+    def add(self, filters: Iterable[AnnotationFilter]) -> bool:
+        """
+        add the filters of a new candidate
+        :return: whether the dependencies changed
+        """
+        ret = False
+        for position, filter_ in zip(self.positional, filters):
+            classes = filter_.classes()
+            dynamic = {c for c in classes if not has_static_subclass_check(c)}
+            if not (classes <= self.filter_classes and dynamic <= position):
+                ret = True
+                self.filter_classes.update(classes)
+                self.dynamic_classes.update(dynamic)
+                position.update(dynamic)
+            if filter_.binds_arg_types() and not self.binds_arg_types:
+                ret = True
+                self.binds_arg_types = True
+        return ret
+
+    def is_static(self) -> bool:
+        """
+        :return: whether no results for this arity can change due to `ABC.register`
+        """
+        return not (self.dynamic_classes or self.binds_arg_types)
+
+    def topology_verdicts(self) -> FrozenSet[Tuple[type, type]]:
+        """
+        :return: all the subclass relations between filter classes that might change due to `ABC.register`, and that
+         the topological order of the candidates depends on
+        """
+        return frozenset(
+            (sub, sup) for sup in self.dynamic_classes for sub in self.filter_classes
+            if sub is not sup and issubclass(sub, sup)
+        )
+
+    def lookup_verdicts(self, t_args: Tuple[type, ...]) -> FrozenSet[tuple]:
+        """
+        :return: all the subclass relations of the argument types that might change due to `ABC.register`, and that the
+         lookup of t_args depends on
+        """
+        ret = {
+            (i, sup) for i, (t, dynamic) in enumerate(zip(t_args, self.positional)) for sup in dynamic
+            if issubclass(t, sup)
+        }
+        if self.binds_arg_types:
+            # the argument types themselves might be used as filters
+            ret.update(
+                (i, j) for j, sup in enumerate(t_args) if not has_nominal_subclass_check(sup)
+                for i, t in enumerate(t_args) if i != j and issubclass(t, sup)
+            )
+        return frozenset(ret)
@@ -1,7 +1,25 @@
 from __future__ import annotations
 
-from abc import ABC, abstractmethod
-from typing import Mapping, TypeVar, Union, FrozenSet, Any
+from abc import ABC, abstractmethod, get_cache_token
+from types import MappingProxyType
+from typing import Callable, Dict, Hashable, Iterable, Mapping, MutableMapping, TypeVar, Union, FrozenSet, Any, \
+    Optional
+from weakref import WeakKeyDictionary, WeakValueDictionary, ref
+
+try:
+    from types import UnionType
+except ImportError:
+    UnionType = None
+
+try:
+    from typing import Literal
+except ImportError:
+    Literal = None
+
+try:
+    from typing import _get_protocol_attrs
+except ImportError:
+    _get_protocol_attrs = None
 
 try:
     from typing import TypedDict
@@ -12,6 +30,10 @@ else:
     del TypedDict
 
 
+# an empty mapping of TypeVar definitions, to be shared by all callers that have none
+NO_DEFINITIONS: Mapping[TypeVar, AnnotationFilter] = MappingProxyType({})
+
+
 def is_type_like(t):
     try:
         isinstance(None, t)
@@ -20,45 +42,236 @@ def is_type_like(t):
     return True
 
 
+def has_nominal_subclass_check(cls) -> bool:
+    """
+    :return: whether `issubclass(x, cls)` depends only on the MRO of `x`. If not (as is the case for ABCs), the result
+     might change during runtime (with `ABC.register`).
+    """
+    return type(cls).__subclasscheck__ is type.__subclasscheck__
+
+
+def protocol_attrs(cls) -> Optional[FrozenSet[str]]:
+    """
+    :return: the names of the members of a Protocol class, or None if they cannot be found
+    """
+    # python 3.12+ stores the members in the class
+    ret = getattr(cls, '__protocol_attrs__', None)
+    if ret is None and _get_protocol_attrs:
+        ret = _get_protocol_attrs(cls)
+    return None if ret is None else frozenset(ret)
+
+
+def is_runtime_protocol(x) -> bool:
+    """
+    :return: whether x is a Protocol class decorated with `runtime_checkable`, whose members can be found
+    """
+    return (isinstance(x, type) and x.__dict__.get('_is_protocol', False)
+            and getattr(x, '_is_runtime_protocol', False) and protocol_attrs(x) is not None)
+
+
+def supports_subclass_check(cls) -> bool:
+    """
+    :return: whether `issubclass(x, cls)` can be called, which is not the case for protocols with data members (unless
+     they define their own `__subclasshook__`)
+    """
+    try:
+        issubclass(object, cls)
+    except TypeError:
+        return False
+    return True
+
+
+def has_static_subclass_check(cls) -> bool:
+    """
+    :return: whether the filter of cls always gives the same verdict for a type, either because it checks the type's
+     MRO, or because it checks the type's members structurally and cannot have classes registered to it
+    """
+    return has_nominal_subclass_check(cls) or (is_runtime_protocol(cls) and not supports_subclass_check(cls))
+
+
+# all the filters that are in use, by their type and the value that defines them (usually the annotation)
+_interned: MutableMapping[Hashable, AnnotationFilter] = WeakValueDictionary()
+
+
+def _intern(key: Hashable, factory: Callable[[], AnnotationFilter]) -> AnnotationFilter:
+    """
+    :return: the filter interned under key, creating it with factory if there is none
+    """
+    try:
+        ret = _interned.get(key)
+    except TypeError:
+        # unhashable annotations are not interned
+        return factory()
+    if ret is None:
+        ret = _interned.setdefault(key, factory())
+    return ret
+
+
 def annotation_filter(x):
+    """
+    :return: the filter of an annotation. Filters are interned, so all equal annotations share the same filter object
+     for as long as it is in use.
+    """
     if TYPED_DICT_META and isinstance(x, TYPED_DICT_META):
         raise TypeError('cannot use a Typed Dict as a multidispatch annotation')
 
+    # in python 3.10+, unions are type-like, so they must be checked first
+    if getattr(x, '__origin__', None) is Union or (UnionType and isinstance(x, UnionType)):
+        args = union_members(annotation_filter(a) for a in x.__args__)
+        if len(args) == 1:
+            return next(iter(args))
+        return _intern((UnionAnnotationFilter, args), lambda: UnionAnnotationFilter(args))
+    if Literal and getattr(x, '__origin__', None) is Literal:
+        # Literal[1] and Literal[True] are equal, so the key must include the values' types
+        values = frozenset((type(v), v) for v in x.__args__)
+        return _intern((LiteralAnnotationFilter, values), lambda: LiteralAnnotationFilter(x.__args__))
+    if is_runtime_protocol(x):
+        return _intern((ProtocolAnnotationFilter, x), lambda: ProtocolAnnotationFilter(x))
     if is_type_like(x):
-        return ClassAnnotationFilter(x)
+        # typing's aliases (like typing.List) are equivalent to their origin classes
+        origin = getattr(x, '__origin__', None)
+        if isinstance(origin, type):
+            x = origin
+        return _intern((ClassAnnotationFilter, x), lambda: ClassAnnotationFilter(x))
     if x in (None, ..., NotImplemented):
         return annotation_filter(type(x))
     if x is Any:
         return AnyAnnotationFilter
     if isinstance(x, TypeVar):
         if x.__constraints__:
-            return ConstrainedTypeVarAnnotatedFilter(x)
-        return BoundedTypeVarAnnotatedFilter(x)
-
-    origin = getattr(x, '__origin__', None)
-    if origin is Union:
-        args = frozenset(annotation_filter(a) for a in x.__args__)
-        return UnionAnnotationFilter(args)
+            return _intern((ConstrainedTypeVarAnnotatedFilter, x), lambda: ConstrainedTypeVarAnnotatedFilter(x))
+        return _intern((BoundedTypeVarAnnotatedFilter, x), lambda: BoundedTypeVarAnnotatedFilter(x))
 
     raise TypeError(x)
 
 
+def envelops_atoms(atoms: FrozenSet[AnnotationFilter], other_atoms: FrozenSet[AnnotationFilter]) -> bool:
+    """
+    :return: whether the union of atoms envelops the union of other_atoms, that is, whether every atom of other_atoms
+     is enveloped by the union of atoms
+    """
+    for b in other_atoms:
+        if b in atoms:
+            continue
+        for a in atoms:
+            if a._envelops_atom(b):
+                break
+        else:
+            if not b._enveloped_by_atoms(atoms):
+                return False
+    return True
+
+
+class _MemoizedEnvelops(ref):
+    """
+    A memoized result of `envelops`, that holds the other filter weakly, and removes itself from the memo of the
+     enveloping filter once the other filter is garbage collected
+    """
+    __slots__ = ('owner', 'key', 'result')
+
+    def __init__(self, other: AnnotationFilter, owner: ref, key: int, result: bool):
+        super().__init__(other, _forget_memoized)
+        self.owner = owner
+        self.key = key
+        self.result = result
+
+    def __new__(cls, other: AnnotationFilter, owner: ref, key: int, result: bool):
+        return super().__new__(cls, other, _forget_memoized)
+
+
+def _forget_memoized(memoized: _MemoizedEnvelops):
+    owner = memoized.owner()
+    if owner is not None and owner._envelops_memo.get(memoized.key) is memoized:
+        del owner._envelops_memo[memoized.key]
+
+
 class AnnotationFilter(ABC):
+    __slots__ = ('__weakref__', '_envelops_memo', '_memo_token')
+
+    def __init__(self):
+        # memoized results of envelops, by the id of the other filter (since filters are interned, and their equality is
+        # slow to check). The other filters are held weakly, since filters are shared by all dispatchers. Only valid
+        # while the ABC cache token is _memo_token.
+        self._envelops_memo: Dict[int, _MemoizedEnvelops] = {}
+        self._memo_token = get_cache_token()
+
     @abstractmethod
     def match(self, x: type, defined: Mapping[TypeVar, AnnotationFilter]) \
             -> Union[bool, Mapping[TypeVar, AnnotationFilter]]:
         pass
 
-    @abstractmethod
     def envelops(self, other: AnnotationFilter) -> bool:
         """
         `self` envelops `other` if, for any defined mapping `d` and type 't',
          `self.match(t, d) or not other.match(t, d)`
+
+        The result is decided by the filters' atoms, and is memoized until the ABC cache token changes.
+        """
+        if other is self:
+            return True
+        token = get_cache_token()
+        if token != self._memo_token:
+            self._envelops_memo = {}
+            self._memo_token = token
+        key = id(other)
+        memoized = self._envelops_memo.get(key)
+        if memoized is not None and memoized() is other:
+            return memoized.result
+        ret = envelops_atoms(self.atoms(), other.atoms())
+        self._envelops_memo[key] = _MemoizedEnvelops(other, ref(self), key, ret)
+        return ret
+
+    def atoms(self) -> FrozenSet[AnnotationFilter]:
+        """
+        :return: the canonical normal form of the filter, a set of atoms (class, single-value literal, TypeVar, and Any
+         filters) whose union is equivalent to the filter
         """
-        return other.enveloped_by(self)
+        return frozenset((self,))
 
-    def enveloped_by(self, other: AnnotationFilter) -> bool:
-        raise TypeError
+    def _envelops_atom(self, atom: AnnotationFilter) -> bool:
+        """
+        :return: whether this atom envelops another atom, that is not equal to it
+        """
+        return False
+
+    def _enveloped_by_atoms(self, atoms: FrozenSet[AnnotationFilter]) -> bool:
+        """
+        :return: whether this atom is enveloped by the union of atoms, even though no single atom envelops it
+        """
+        return False
+
+    @abstractmethod
+    def classes(self) -> FrozenSet[type]:
+        """
+        :return: all the classes the filter might check subclasses of
+        """
+        pass
+
+    def binds_arg_types(self) -> bool:
+        """
+        :return: whether the filter might bind the type of an argument, to be used as a filter for other arguments
+        """
+        return False
+
+    def type_vars(self) -> FrozenSet[TypeVar]:
+        """
+        :return: all the TypeVars the filter might bind or be bound by
+        """
+        return frozenset()
+
+    def value_dependent(self) -> bool:
+        """
+        :return: whether the filter might reject an argument whose type it matched, depending on the argument's value.
+         If so, the argument's value must also be checked with `match_value`.
+        """
+        return False
+
+    def match_value(self, value) -> bool:
+        """
+        :return: whether the filter accepts a value, only called for value-dependent filters, after the value's type
+         was matched
+        """
+        return True
 
     @abstractmethod
     def __str__(self):
@@ -66,16 +279,28 @@ class AnnotationFilter(ABC):
 
 
 class ClassAnnotationFilter(AnnotationFilter):
+    __slots__ = ('cls',)
+
     def __init__(self, cls: type):
+        super().__init__()
         self.cls = cls
 
     def match(self, x, defined: Mapping[TypeVar, AnnotationFilter]):
         return issubclass(x, self.cls)
 
-    def envelops(self, other: AnnotationFilter) -> bool:
-        if isinstance(other, ClassAnnotationFilter):
-            return issubclass(other.cls, self.cls)
-        return super().envelops(other)
+    def _envelops_atom(self, atom: AnnotationFilter) -> bool:
+        if isinstance(atom, ClassAnnotationFilter):
+            try:
+                return issubclass(atom.cls, self.cls)
+            except TypeError:
+                # atom.cls is type-like, but not a class
+                return False
+        if isinstance(atom, LiteralAnnotationFilter):
+            return all(issubclass(t, self.cls) for t in atom.types)
+        return False
+
+    def classes(self) -> FrozenSet[type]:
+        return frozenset((self.cls,))
 
     def __str__(self):
         return self.cls.__name__
@@ -87,11 +312,103 @@ class ClassAnnotationFilter(AnnotationFilter):
         return hash(self.cls)
 
 
+class ProtocolAnnotationFilter(ClassAnnotationFilter):
+    """
+    A filter for a runtime-checkable Protocol. A type is matched structurally, if every member of the protocol is
+     defined (and not None) or annotated in its MRO, and the structural verdict for every type is cached. Unlike
+     `issubclass`, this also supports protocols with data members. Types that fail the structural check are matched
+     with `issubclass` if the protocol supports it, so classes that are registered to the protocol (or accepted by its
+     `__subclasshook__`) are matched as well.
+    """
+    __slots__ = ('attrs', 'registrable', '_verdicts')
+
+    def __init__(self, cls: type):
+        super().__init__(cls)
+        self.attrs = protocol_attrs(cls)
+        # whether the verdicts might change due to `ABC.register`
+        self.registrable = supports_subclass_check(cls)
+        self._verdicts: WeakKeyDictionary[type, bool] = WeakKeyDictionary()
+
+    def match(self, x, defined: Mapping[TypeVar, AnnotationFilter]):
+        ret = self._verdicts.get(x)
+        if ret is None:
+            ret = self._verdicts[x] = self._structural_match(x)
+        return ret or (self.registrable and issubclass(x, self.cls))
+
+    def _structural_match(self, x: type) -> bool:
+        mro = x.__mro__
+        if self.cls in mro:
+            return True
+        for attr in self.attrs:
+            for base in mro:
+                namespace = base.__dict__
+                if attr in namespace:
+                    if namespace[attr] is None:
+                        return False
+                    break
+                if attr in namespace.get('__annotations__', ()):
+                    break
+            else:
+                return False
+        return True
+
+    def _envelops_atom(self, atom: AnnotationFilter) -> bool:
+        if isinstance(atom, ProtocolAnnotationFilter):
+            return self.cls in atom.cls.__mro__ or self.attrs <= atom.attrs
+        if isinstance(atom, ClassAnnotationFilter):
+            return isinstance(atom.cls, type) and self.match(atom.cls, NO_DEFINITIONS)
+        if isinstance(atom, LiteralAnnotationFilter):
+            return all(self.match(t, NO_DEFINITIONS) for t in atom.types)
+        return False
+
+
+def union_members(members: Iterable[AnnotationFilter]) -> FrozenSet[AnnotationFilter]:
+    """
+    :return: the normalized members of a union of filters: nested unions are flattened, and members without TypeVars
+     that are enveloped by other such members are removed
+    """
+    flat = set()
+    for m in members:
+        if isinstance(m, UnionAnnotationFilter):
+            flat.update(m.args)
+        else:
+            flat.add(m)
+    # members with TypeVars are never removed, since they might bind their TypeVars
+    plain = [m for m in flat if not m.type_vars()]
+    for m in plain:
+        for other in plain:
+            if other is m or other not in flat:
+                continue
+            if other.envelops(m):
+                flat.discard(m)
+                break
+    return frozenset(flat)
+
+
 class UnionAnnotationFilter(AnnotationFilter):
+    """
+    A filter for a union of filters, the members should be normalized with `union_members`. A union of only plain
+     class members is matched with a single `issubclass` call.
+    """
+    __slots__ = ('args', '_classes', '_type_vars', '_atoms')
+
     def __init__(self, args: FrozenSet[AnnotationFilter]):
+        super().__init__()
         self.args = args
+        self._atoms = frozenset().union(*(a.atoms() for a in args))
+        # the classes of the members, if all of them are plain class filters
+        self._classes = tuple(a.cls for a in args) if all(type(a) is ClassAnnotationFilter for a in args) else None
+        self._type_vars = self.type_vars()
 
     def match(self, x, defined: Mapping[TypeVar, AnnotationFilter]):
+        if self._classes is not None:
+            return issubclass(x, self._classes)
+        if not self._type_vars:
+            # the members return only booleans
+            for a in self.args:
+                if a.match(x, defined):
+                    return True
+            return False
         results = (a.match(x, defined) for a in self.args)
         first_truish = False
         for r in results:
@@ -108,17 +425,24 @@ class UnionAnnotationFilter(AnnotationFilter):
                 first_truish = r
         return first_truish
 
-    def envelops(self, other: AnnotationFilter) -> bool:
-        if isinstance(other, ClassAnnotationFilter):
-            return any(a.envelops(other) for a in self.args)
-        if isinstance(other, UnionAnnotationFilter):
-            return all(self.envelops(a) for a in other.args)
-        return super().envelops(other)
+    def atoms(self) -> FrozenSet[AnnotationFilter]:
+        return self._atoms
 
-    def enveloped_by(self, other: AnnotationFilter) -> bool:
-        if isinstance(other, ClassAnnotationFilter):
-            return all(other.envelops(a) for a in self.args)
-        return super().enveloped_by(other)
+    def classes(self) -> FrozenSet[type]:
+        return frozenset().union(*(a.classes() for a in self.args))
+
+    def binds_arg_types(self) -> bool:
+        return any(a.binds_arg_types() for a in self.args)
+
+    def type_vars(self) -> FrozenSet[TypeVar]:
+        return frozenset().union(*(a.type_vars() for a in self.args))
+
+    def value_dependent(self) -> bool:
+        return any(a.value_dependent() for a in self.args)
+
+    def match_value(self, value) -> bool:
+        t = type(value)
+        return any(a.match(t, {}) and a.match_value(value) for a in self.args)
 
     def __eq__(self, other):
         return type(self) == type(other) and self.args == other.args
@@ -130,8 +454,69 @@ class UnionAnnotationFilter(AnnotationFilter):
         return '(' + "|".join(str(i) for i in self.args) + ")"
 
 
+class LiteralAnnotationFilter(AnnotationFilter):
+    """
+    A filter for a `typing.Literal` annotation. Since candidates are resolved by the arguments' types, the filter
+     matches the exact types of its values, and the values themselves are matched with a hash lookup in `match_value`.
+    """
+    __slots__ = ('values', 'types', '_atoms')
+
+    def __init__(self, values):
+        super().__init__()
+        # values are stored with their types, so that (for example) 1 and True are not considered equal
+        self.values = frozenset((type(v), v) for v in values)
+        self.types = frozenset(t for (t, _) in self.values)
+        # the single-value literals of the values, or None if there is only one value (in which case the filter is its
+        # own atom)
+        self._atoms = None if len(self.values) == 1 else frozenset(_literal_atom(v) for (_, v) in self.values)
+
+    def match(self, x, defined: Mapping[TypeVar, AnnotationFilter]):
+        return x in self.types
+
+    def value_dependent(self) -> bool:
+        return True
+
+    def match_value(self, value) -> bool:
+        try:
+            return (type(value), value) in self.values
+        except TypeError:
+            # unhashable values are never literals
+            return False
+
+    def atoms(self) -> FrozenSet[AnnotationFilter]:
+        if self._atoms is None:
+            return frozenset((self,))
+        return self._atoms
+
+    def _envelops_atom(self, atom: AnnotationFilter) -> bool:
+        return isinstance(atom, LiteralAnnotationFilter) and atom.values <= self.values
+
+    def classes(self) -> FrozenSet[type]:
+        return self.types
+
+    def __eq__(self, other):
+        return type(self) == type(other) and self.values == other.values
+
+    def __hash__(self):
+        return hash(self.values)
+
+    def __str__(self):
+        return 'Literal[' + ", ".join(repr(v) for (_, v) in self.values) + "]"
+
+
+def _literal_atom(value) -> LiteralAnnotationFilter:
+    """
+    :return: the interned filter of a literal with a single value
+    """
+    key = (LiteralAnnotationFilter, frozenset(((type(value), value),)))
+    return _intern(key, lambda: LiteralAnnotationFilter((value,)))
+
+
 class TypeVarAnnotationFilter(AnnotationFilter):
+    __slots__ = ('tv',)
+
     def __init__(self, tv: TypeVar):
+        super().__init__()
         self.tv = tv
 
     @abstractmethod
@@ -140,6 +525,9 @@ class TypeVarAnnotationFilter(AnnotationFilter):
         if already_defined:
             return already_defined.match(x, defined)
 
+    def type_vars(self) -> FrozenSet[TypeVar]:
+        return frozenset((self.tv,))
+
     def __eq__(self, other):
         return type(self) == type(other) and self.tv == other.tv
 
@@ -151,32 +539,62 @@ class TypeVarAnnotationFilter(AnnotationFilter):
 
 
 class ConstrainedTypeVarAnnotatedFilter(TypeVarAnnotationFilter):
+    __slots__ = ('constraints',)
+
     def __init__(self, tv: TypeVar):
         super().__init__(tv)
-        self.constraints = [annotation_filter(c) for c in tv.__constraints__]
+        self.constraints = tuple(annotation_filter(c) for c in tv.__constraints__)
 
     def match(self, x, defined: Mapping[TypeVar, AnnotationFilter]) -> Union[bool, Mapping[TypeVar, AnnotationFilter]]:
         s = super().match(x, defined)
         if s is not None:
             return s
-        matches = list(filter(lambda t: t[1], ((af, af.match(x, defined)) for af in self.constraints)))
-        if not matches:
+        matched = match = None
+        for af in self.constraints:
+            m = af.match(x, defined)
+            if not m:
+                continue
+            if matched is not None:
+                raise TypeError(f'ambiguous typevar match, value {x} matched {matched}, {af}')
+            matched = af
+            match = m
+        if matched is None:
             return False
-        if len(matches) == 1:
-            af, match = matches[0]
-            if match is True:
-                return {self.tv: af}
-            return {**match, self.tv: af}
-        raise TypeError(f'ambiguous typevar match, value {x} matched {", ".join(a for (a, _) in matches)}')
+        if match is True:
+            return {self.tv: matched}
+        return {**match, self.tv: matched}
 
-    def envelops(self, other: AnnotationFilter) -> bool:
-        return self == other or all(c.envelops(other) for c in self.constraints)
+    def matching_constraint(self, x) -> Optional[AnnotationFilter]:
+        """
+        :return: the only constraint that matches x, or None if none do. Only valid if the constraints have no TypeVars.
+        """
+        ret = None
+        for af in self.constraints:
+            if af.match(x, NO_DEFINITIONS):
+                if ret is not None:
+                    raise TypeError(f'ambiguous typevar match, value {x} matched {ret}, {af}')
+                ret = af
+        return ret
+
+    def _envelops_atom(self, atom: AnnotationFilter) -> bool:
+        return all(c.envelops(atom) for c in self.constraints)
+
+    def _enveloped_by_atoms(self, atoms: FrozenSet[AnnotationFilter]) -> bool:
+        return all(envelops_atoms(atoms, c.atoms()) for c in self.constraints)
+
+    def classes(self) -> FrozenSet[type]:
+        return frozenset().union(*(c.classes() for c in self.constraints))
 
-    def enveloped_by(self, other: AnnotationFilter) -> bool:
-        return self == other or all(other.envelops(c) for c in self.constraints)
+    def binds_arg_types(self) -> bool:
+        return any(c.binds_arg_types() for c in self.constraints)
+
+    def type_vars(self) -> FrozenSet[TypeVar]:
+        return super().type_vars().union(*(c.type_vars() for c in self.constraints))
 
 
 class BoundedTypeVarAnnotatedFilter(TypeVarAnnotationFilter):
+    __slots__ = ('bound',)
+
     def __init__(self, tv: TypeVar):
         super().__init__(tv)
         self.bound = annotation_filter(tv.__bound__ or object)
@@ -192,22 +610,30 @@ class BoundedTypeVarAnnotatedFilter(TypeVarAnnotationFilter):
             return {**sub_match, self.tv: annotation_filter(x)}
         return False
 
-    def envelops(self, other: AnnotationFilter) -> bool:
-        return self == other
+    def _enveloped_by_atoms(self, atoms: FrozenSet[AnnotationFilter]) -> bool:
+        return envelops_atoms(atoms, self.bound.atoms())
+
+    def classes(self) -> FrozenSet[type]:
+        return self.bound.classes()
 
-    def enveloped_by(self, other: AnnotationFilter) -> bool:
-        return self == other or other.envelops(self.bound)
+    def type_vars(self) -> FrozenSet[TypeVar]:
+        return super().type_vars() | self.bound.type_vars()
+
+    def binds_arg_types(self) -> bool:
+        return True
 
 
 class _AnyAnnotationFilter(AnnotationFilter):
+    __slots__ = ()
+
     def match(self, x: type, defined: Mapping[TypeVar, AnnotationFilter]):
         return True
 
-    def envelops(self, other: AnnotationFilter) -> bool:
+    def _envelops_atom(self, atom: AnnotationFilter) -> bool:
         return True
 
-    def enveloped_by(self, other: AnnotationFilter) -> bool:
-        return other is self
+    def classes(self) -> FrozenSet[type]:
+        return frozenset()
 
     def __str__(self):
         return 'Any'
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+from abc import get_cache_token
+from functools import wraps
+from inspect import isawaitable, iscoroutinefunction
+from time import perf_counter
+from typing import Awaitable, Callable, Iterable, List, Sequence, Tuple, TypeVar
+from weakref import proxy
+
+from dyndis.multidispatch import MultiDispatch, _Continuation, _LazyResolution, _ValueSwitch
+from dyndis.statistics import DispatchStatistics
+
+T = TypeVar('T')
+
+
+def _as_coroutine_function(func: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    """
+    :return: func if it is a coroutine function, or a coroutine function that calls func otherwise. The result of func
+     is awaited if it is awaitable, so that sync wrappers of coroutine functions (and objects with an async
+     `__call__`) are also supported.
+    """
+    if iscoroutinefunction(func):
+        return func
+
+    @wraps(func)
+    async def ret(*args, **kwargs):
+        ret_ = func(*args, **kwargs)
+        if isawaitable(ret_):
+            ret_ = await ret_
+        return ret_
+
+    return ret
+
+
+async def _call_lazy_resolution(self: _LazyResolution, *args, **kwargs):
+    for callback in self._resolve(args):
+        ret = await callback(*args, **kwargs)
+        if ret is not NotImplemented:
+            return ret
+    return ret
+
+
+class _AsyncContinuation(_Continuation):
+    __slots__ = ()
+    __call__ = _call_lazy_resolution
+
+
+class _AsyncValueSwitch(_ValueSwitch):
+    __slots__ = ()
+    __call__ = _call_lazy_resolution
+
+
+class AsyncMultiDispatch(MultiDispatch):
+    """
+    A MultiDispatch whose candidates are coroutine functions. Calling it returns a coroutine that awaits the matching
+     candidates in order, until one does not return NotImplemented. Candidates (and the default callback) that are not
+     coroutine functions are wrapped as ones when they are registered.
+    """
+    __slots__ = ()
+    _Continuation = _AsyncContinuation
+    _ValueSwitch = _AsyncValueSwitch
+
+    def __init__(self, default_callback: Callable[..., T], **kwargs):
+        super().__init__(_as_coroutine_function(default_callback), **kwargs)
+
+    def _add_candidate(self, func, filters, **kwargs):
+        super()._add_candidate(_as_coroutine_function(func), filters, **kwargs)
+
+    def _make_call_path(self) -> Tuple[Callable[..., Awaitable[T]], Callable[[], int]]:
+        if self._statistics is not None or self._active_hooks:
+            return self._make_instrumented_call_path()
+        return self._make_fast_call_path()
+
+    def _make_fast_call_path(self) -> Tuple[Callable[..., Awaitable[T]], Callable[[], int]]:
+        self_ = proxy(self)
+        hits = 0
+        lookup = self._lookup_cache
+        key_of = self._key_of
+        track_abc = not self._is_abc_static()
+
+        async def call(*args, **kwargs):
+            nonlocal hits
+            if track_abc and get_cache_token() != self_._cache_token:
+                self_._refresh_cache_token()
+
+            t_args = key_of(args)
+            resolution = lookup.get(t_args)
+            if resolution is None:
+                resolution = self_._get_resolution(t_args)
+            else:
+                hits += 1
+
+            for callback in resolution:
+                ret = await callback(*args, **kwargs)
+                if ret is not NotImplemented:
+                    return ret
+            return ret
+
+        def get_hits():
+            return hits
+
+        return call, get_hits
+
+    def _make_instrumented_call_path(self) -> Tuple[Callable[..., Awaitable[T]], Callable[[], int]]:
+        """
+        create a call function that collects statistics and calls hooks, the time spent in candidates includes the time
+         they spend suspended
+        """
+        self_ = proxy(self)
+        lookup = self._lookup_cache
+        key_of = self._key_of
+        track_abc = not self._is_abc_static()
+        stats = self._statistics or DispatchStatistics()
+        traced = bool(self._active_hooks)
+        hits = 0
+
+        async def call(*args, **kwargs):
+            nonlocal hits
+            start = perf_counter()
+            if track_abc and get_cache_token() != self_._cache_token:
+                self_._refresh_cache_token()
+            t_args = key_of(args)
+            resolution = lookup.get(t_args)
+            if resolution is None:
+                resolution = self_._get_resolution(t_args)
+                stats.misses += 1
+            else:
+                hits += 1
+                stats.hits += 1
+            stats.calls += 1
+            stats.resolution_time += perf_counter() - start
+
+            callbacks = list(resolution)
+            depth = 0
+            for callback in callbacks:
+                if isinstance(callback, _LazyResolution):
+                    start = perf_counter()
+                    callbacks.extend(callback._resolve(args))
+                    stats.resolution_time += perf_counter() - start
+                    continue
+                if traced:
+                    self_._trace_callback(t_args, callback)
+                stats.callback_calls[callback] += 1
+                start = perf_counter()
+                try:
+                    ret = await callback(*args, **kwargs)
+                finally:
+                    stats.body_time += perf_counter() - start
+                if ret is not NotImplemented:
+                    break
+                if traced:
+                    self_._trace_callback(t_args, callback, returned_not_implemented=True)
+                stats.callback_not_implemented[callback] += 1
+                depth += 1
+            stats.fallthrough_depths[depth] += 1
+            return ret
+
+        def get_hits():
+            return hits
+
+        return call, get_hits
+
+    async def map(self, args_iterable: Iterable[Sequence], **kwargs) -> List[T]:
+        """
+        call the AsyncMultiDispatch for every tuple of arguments, awaiting the calls one after the other
+        :return: the results of the calls, in order
+        """
+        return [await self(*args, **kwargs) for args in args_iterable]
+
+    async def map_columns(self, *columns: Iterable, **kwargs) -> List[T]:
+        return await self.map(zip(*columns), **kwargs)
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import ContextManager, Dict, FrozenSet, List, Optional, Set, Tuple, TYPE_CHECKING
+
+from dyndis.annotation_filter import AnnotationFilter, ClassAnnotationFilter, ProtocolAnnotationFilter, \
+    UnionAnnotationFilter, has_nominal_subclass_check, BoundedTypeVarAnnotatedFilter, \
+    ConstrainedTypeVarAnnotatedFilter, LiteralAnnotationFilter
+from dyndis.typetuplecache import TypeTupleCache
+
+if TYPE_CHECKING:
+    from dyndis.multidispatch import Candidate
+
+
+def indexable_classes(filter_: AnnotationFilter) -> Optional[FrozenSet[type]]:
+    """
+    :return: a set of classes, so that the filter accepts a type if and only if one of the classes is in its MRO, or
+     None if the filter cannot be described this way
+    """
+    if isinstance(filter_, ClassAnnotationFilter):
+        if isinstance(filter_.cls, type) and has_nominal_subclass_check(filter_.cls):
+            return frozenset((filter_.cls,))
+        return None
+    if isinstance(filter_, UnionAnnotationFilter):
+        ret = set()
+        for arg in filter_.args:
+            arg_classes = indexable_classes(arg)
+            if arg_classes is None:
+                return None
+            ret.update(arg_classes)
+        return frozenset(ret)
+    return None
+
+
+def indexable_terms(filter_: AnnotationFilter) \
+        -> Optional[Tuple[FrozenSet[type], FrozenSet[ProtocolAnnotationFilter]]]:
+    """
+    :return: a set of classes and a set of protocol filters, so that the filter accepts a type if and only if one of
+     the classes is in its MRO or one of the protocol filters accepts it, or None if the filter cannot be described
+     this way
+    """
+    if isinstance(filter_, ProtocolAnnotationFilter):
+        return frozenset(), frozenset((filter_,))
+    if isinstance(filter_, UnionAnnotationFilter):
+        classes = set()
+        protocols = set()
+        for arg in filter_.args:
+            arg_terms = indexable_terms(arg)
+            if arg_terms is None:
+                return None
+            classes.update(arg_terms[0])
+            protocols.update(arg_terms[1])
+        return frozenset(classes), frozenset(protocols)
+    classes = indexable_classes(filter_)
+    if classes is None:
+        return None
+    return classes, frozenset()
+
+
+def superset_terms(filter_: AnnotationFilter) \
+        -> Optional[Tuple[FrozenSet[type], FrozenSet[ProtocolAnnotationFilter]]]:
+    """
+    :return: like indexable_terms, except that the filter might reject some of the types the terms accept. A TypeVar
+     filter is described by the terms of its bound or constraints (this is only valid if the TypeVar is not given an
+     initial definition), and a Literal filter by the types of its values (whose subclasses it rejects).
+    """
+    if isinstance(filter_, LiteralAnnotationFilter):
+        return filter_.types, frozenset()
+    if isinstance(filter_, BoundedTypeVarAnnotatedFilter):
+        return superset_terms(filter_.bound)
+    if isinstance(filter_, ConstrainedTypeVarAnnotatedFilter):
+        args = filter_.constraints
+    elif isinstance(filter_, UnionAnnotationFilter):
+        args = filter_.args
+    else:
+        return indexable_terms(filter_)
+    classes = set()
+    protocols = set()
+    for arg in args:
+        arg_terms = superset_terms(arg)
+        if arg_terms is None:
+            return None
+        classes.update(arg_terms[0])
+        protocols.update(arg_terms[1])
+    return frozenset(classes), frozenset(protocols)
+
+
+class DispatchIndex:
+    """
+    An index of the candidates of a single arity, with a table for every parameter position, that maps a type to the
+     candidates whose filter in that position might accept it. The candidates that might match a tuple of types are
+     the intersection of the tables' entries for these types.
+
+    Every candidate is given a bit, and sets of candidates are stored as integer bitmasks, so intersecting them is a
+     single big-int operation for every position.
+
+    Protocol filters are kept in a separate table for every position, and are checked against every new type (their
+     structural verdicts are cached by the filters themselves). Protocols that classes can be registered to might change
+     their verdicts, so the memoized masks of their positions are forgotten when the ABC cache token changes.
+
+    TypeVar filters are indexed by their bounds or constraints, but candidates with them are never exact.
+
+    Filters that cannot be described by the MRO of the types they accept (like ABCs, Any, and TypeVars with initial
+     definitions) are unindexed, and might accept any type. Candidates with only indexed filters are exact, they match a
+     tuple of types if and only if they are in the intersection.
+    """
+
+    def __init__(self, arity: int, lock: Optional[ContextManager] = None):
+        self.arity = arity
+        # the candidate of every bit
+        self.candidates: List[Candidate] = []
+        self.exact: Set[Candidate] = set()
+        self._by_class: List[Dict[type, int]] = [defaultdict(int) for _ in range(arity)]
+        self._by_protocol: List[Dict[ProtocolAnnotationFilter, int]] = [defaultdict(int) for _ in range(arity)]
+        self._unindexed: List[int] = [0] * arity
+        # memoized results of accepted, for every position
+        self._accepted: List[TypeTupleCache[int]] = [TypeTupleCache(lock) for _ in range(arity)]
+
+    def set_lock(self, lock: ContextManager):
+        """
+        replace the lock that the memoized results' callbacks hold
+        """
+        for accepted in self._accepted:
+            accepted.set_lock(lock)
+
+    def refresh(self):
+        """
+        forget the memoized masks of positions with protocols that classes can be registered to, called when the ABC
+         cache token changes
+        """
+        for by_protocol, accepted in zip(self._by_protocol, self._accepted):
+            if any(p.registrable for p in by_protocol):
+                accepted.clear()
+
+    def add(self, candidate: Candidate):
+        bit = 1 << len(self.candidates)
+        self.candidates.append(candidate)
+        exact = True
+        for i, (by_class, by_protocol, accepted, filter_) in enumerate(
+                zip(self._by_class, self._by_protocol, self._accepted, candidate.filters)):
+            terms = indexable_terms(filter_)
+            if terms is None:
+                exact = False
+                if not candidate.initial_definitions:
+                    terms = superset_terms(filter_)
+            if terms is None:
+                self._unindexed[i] |= bit
+                for key in accepted.keys():
+                    accepted[key] |= bit
+            else:
+                classes, protocols = terms
+                for cls in classes:
+                    by_class[cls] |= bit
+                for protocol in protocols:
+                    by_protocol[protocol] |= bit
+                for key in accepted.keys():
+                    if not classes.isdisjoint(key[0].__mro__) or any(p.match(key[0], {}) for p in protocols):
+                        accepted[key] |= bit
+        if exact:
+            self.exact.add(candidate)
+
+    def accepted(self, position: int, cls: type) -> int:
+        """
+        :return: the mask of all the candidates whose filter in position might accept cls
+        """
+        memo = self._accepted[position]
+        ret = memo.get((cls,))
+        if ret is None:
+            by_class = self._by_class[position]
+            ret = self._unindexed[position]
+            for m in cls.__mro__:
+                ret |= by_class.get(m, 0)
+            for protocol, mask in self._by_protocol[position].items():
+                if protocol.match(cls, {}):
+                    ret |= mask
+            memo[cls, ] = ret
+        return ret
+
+    def applicable(self, t_args: Tuple[type, ...]) -> List[Candidate]:
+        """
+        :return: a superset of all the candidates that match t_args, all exact candidates in the set match t_args
+        """
+        if not t_args:
+            return list(self.candidates)
+        mask = -1
+        for i, t in enumerate(t_args):
+            mask &= self.accepted(i, t)
+            if not mask:
+                return []
+        ret = []
+        candidates = self.candidates
+        while mask:
+            low = mask & -mask
+            ret.append(candidates[low.bit_length() - 1])
+            mask ^= low
+        return ret
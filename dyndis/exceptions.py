@@ -1,2 +1,6 @@
 class AmbiguityError(TypeError):
     """An error indicating that a multidispatch had to decide between candidates of equal precedence"""
+
+
+class FrozenDispatchError(RuntimeError):
+    """An error indicating that a candidate was registered to a frozen multidispatch"""
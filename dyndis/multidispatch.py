@@ -2,29 +2,81 @@ from __future__ import annotations
 
 from abc import get_cache_token
 from collections import defaultdict, ChainMap
-from functools import partial
-from inspect import signature, Parameter
+from contextlib import nullcontext
+from functools import partial, wraps
+from operator import attrgetter, itemgetter
+from inspect import signature, Parameter, isabstract, CO_VARARGS
+from itertools import product
 from typing import Callable, TypeVar, Generic, Dict, Set, List, Mapping, get_type_hints, Union, Tuple, Optional, \
-    MutableMapping
-from weakref import WeakValueDictionary, proxy
+    MutableMapping, NoReturn, FrozenSet, NamedTuple, Iterable, Any, MutableSet, Sequence, ContextManager
+from threading import RLock
+from time import perf_counter
+from types import FunctionType
+from weakref import WeakValueDictionary, WeakSet, proxy, ref
 
 
-from dyndis.annotation_filter import AnnotationFilter, annotation_filter
-from dyndis.exceptions import AmbiguityError
+from dyndis.abc_dependencies import AbcDependencies
+from dyndis.annotation_filter import AnnotationFilter, annotation_filter, ClassAnnotationFilter, \
+    has_nominal_subclass_check, NO_DEFINITIONS, BoundedTypeVarAnnotatedFilter, ConstrainedTypeVarAnnotatedFilter
+from dyndis.dispatch_index import DispatchIndex
+from dyndis.exceptions import AmbiguityError, FrozenDispatchError
 from dyndis.implementor import Implementor
-from dyndis.topological_sort import topological_sort
-from dyndis.weaktupledict import WeakTupleDict
+from dyndis.statistics import DispatchStatistics
+from dyndis.tracing import Hook, TraceEvent
+from dyndis.topological_sort import topological_sort, topological_insert
+from dyndis.typetuplecache import TypeTupleCache
 
 T = TypeVar('T')
 
+# the kinds of steps of a compiled match
+# the filter has no TypeVars
+_PLAIN = 0
+# a bounded TypeVar, the first argument that matches the bound binds its type to the TypeVar
+_BOUNDED = 1
+# a constrained TypeVar, the first argument binds the constraint it matches to the TypeVar
+_CONSTRAINED = 2
+
+# the kind of a step, the index of its TypeVar's slot, and the filter to check the argument against before the TypeVar
+# is bound
+MatchStep = Tuple[int, int, AnnotationFilter]
+
+
+def _compile_match(filters: Sequence[AnnotationFilter]) -> Optional[Tuple[Tuple[MatchStep, ...], int]]:
+    """
+    compile the filters of a candidate into match steps, where every TypeVar is bound in a slot with its own index
+    :return: the steps and the number of slots, or None if a TypeVar is nested in another filter, or has TypeVars in
+     its bound or constraints
+    """
+    slots: Dict[TypeVar, int] = {}
+    steps = []
+    for f in filters:
+        if not f.type_vars():
+            steps.append((_PLAIN, -1, f))
+            continue
+        if isinstance(f, BoundedTypeVarAnnotatedFilter) and not f.bound.type_vars():
+            kind, target = _BOUNDED, f.bound
+        elif isinstance(f, ConstrainedTypeVarAnnotatedFilter) and not any(c.type_vars() for c in f.constraints):
+            kind, target = _CONSTRAINED, f
+        else:
+            return None
+        steps.append((kind, slots.setdefault(f.tv, len(slots)), target))
+    return tuple(steps), len(slots)
+
 
 class Candidate(Generic[T]):
+    __slots__ = ('callback', 'filters', 'owner', 'initial_definitions', 'value_filters', '_steps', '_n_slots')
+
     def __init__(self, callback: Callable[..., T], filters: Tuple[AnnotationFilter], owner: MultiDispatch, *,
-                 initial_definitions: Optional[Dict[TypeVar, AnnotationFilter]] = None):
+                 initial_definitions: Optional[Mapping[TypeVar, AnnotationFilter]] = None):
         self.callback = callback
         self.filters = filters
         self.owner = proxy(owner)
-        self.initial_definitions = initial_definitions or {}
+        self.initial_definitions = initial_definitions or NO_DEFINITIONS
+        # the positions and filters that depend on the arguments' values, and not only their types
+        self.value_filters = tuple((i, f) for (i, f) in enumerate(filters) if f.value_dependent())
+        # candidates with initial definitions are matched with a mapping of definitions
+        compiled = None if initial_definitions else _compile_match(filters)
+        self._steps, self._n_slots = compiled or (None, 0)
 
     def __str__(self):
         return self.owner.__name__ + "<" + ", ".join(str(f) for f in self.filters) + ">"
@@ -41,7 +93,56 @@ class Candidate(Generic[T]):
                 return False
         return partial
 
+    def match_values(self, args) -> bool:
+        """
+        :return: whether the values of args match the value-dependent filters, args' types must already match
+        """
+        return all(f.match_value(args[i]) for (i, f) in self.value_filters)
+
+    def might_match(self, args) -> bool:
+        """
+        :return: whether the candidate matches the types args, or might match them (if matching them raised an error,
+         which will be raised when the candidate is resolved)
+        """
+        try:
+            return bool(self.match(args))
+        except TypeError:
+            return True
+
     def match(self, args):
+        steps = self._steps
+        if steps is None:
+            return self._match_definitions(args)
+        if not self._n_slots:
+            for a, f in zip(args, self.filters):
+                if not f.match(a, NO_DEFINITIONS):
+                    return False
+            return True
+        # the bound values of the TypeVars, the type of the argument for bounded TypeVars, or the matched constraint for
+        # constrained TypeVars
+        bound = [None] * self._n_slots
+        for a, (kind, slot, f) in zip(args, steps):
+            if kind == _PLAIN:
+                if not f.match(a, NO_DEFINITIONS):
+                    return False
+                continue
+            b = bound[slot]
+            if kind == _BOUNDED:
+                if b is None:
+                    if not f.match(a, NO_DEFINITIONS):
+                        return False
+                    bound[slot] = a
+                elif not issubclass(a, b):
+                    return False
+            elif b is None:
+                b = bound[slot] = f.matching_constraint(a)
+                if b is None:
+                    return False
+            elif not b.match(a, NO_DEFINITIONS):
+                return False
+        return True
+
+    def _match_definitions(self, args):
         defined = dict(self.initial_definitions)
         for a, f in zip(args, self.filters):
             r = f.match(a, defined)
@@ -52,82 +153,999 @@ class Candidate(Generic[T]):
         return True
 
 
+def _filter_class(filter_: AnnotationFilter) -> Optional[type]:
+    """
+    :return: the class of a plain class filter, or None if the filter is not a plain class filter
+    """
+    if isinstance(filter_, ClassAnnotationFilter) and isinstance(filter_.cls, type):
+        return filter_.cls
+    return None
+
+
+def possible_envelopers(candidates: Iterable[Candidate]) -> Callable[[Candidate], Set[Candidate]]:
+    """
+    Index candidates by the classes of their filters, to quickly find the candidates that might envelop a candidate.
+
+    A candidate can only envelop another if, in every position where the other has a plain class filter, the
+     candidate's filter is either a class in that class's MRO, or not a plain class with a nominal subclass check.
+
+    :return: a function that returns, for a candidate, a superset of the candidates that might envelop it
+    """
+    candidates = set(candidates)
+    if not candidates:
+        return lambda _: candidates
+    arity = len(next(iter(candidates)).filters)
+    by_class: List[Dict[type, Set[Candidate]]] = [defaultdict(set) for _ in range(arity)]
+    unindexed: List[Set[Candidate]] = [set() for _ in range(arity)]
+    for c in candidates:
+        for i, f in enumerate(c.filters):
+            cls = _filter_class(f)
+            if cls is None or not has_nominal_subclass_check(cls):
+                unindexed[i].add(c)
+            else:
+                by_class[i][cls].add(c)
+
+    def ret(candidate: Candidate) -> Set[Candidate]:
+        result = None
+        for i, f in enumerate(candidate.filters):
+            cls = _filter_class(f)
+            if cls is None:
+                continue
+            position_index = by_class[i]
+            possible = unindexed[i].union(*(position_index[m] for m in cls.__mro__ if m in position_index))
+            result = possible if result is None else result & possible
+            if not result:
+                break
+        return candidates if result is None else result
+
+    return ret
+
+
 LookupLayer = Union[Exception, Candidate]
+Resolution = Tuple[Callable[..., T], ...]
+# the candidates that might match a type tuple, along with their layer index, sorted by layer
+Applicable = List[Tuple[int, Candidate]]
+KeyExtractor = Callable[[Any], Any]
+
+
+def _might_match(candidate: Candidate, t_args: Tuple[type, ...]) -> bool:
+    try:
+        return candidate.match(t_args)
+    except TypeError:
+        return True
+
+
+def _arg_types_of(args: Sequence) -> Tuple[type, ...]:
+    return tuple(map(type, args))
+
+
+def _key_function(key_extractors: Sequence[Optional[KeyExtractor]]) -> Callable[[Sequence], Tuple[type, ...]]:
+    """
+    :return: a function that returns the lookup key of a tuple of arguments. The key of an argument in a position with
+     an extractor is the extracted class, or the type of the extracted value if it is not a class. The key of any other
+     argument is its type.
+    """
+    if not any(key_extractors):
+        return _arg_types_of
+    extractors = tuple(key_extractors)
+    n = len(extractors)
+
+    def ret(args):
+        key = []
+        for e, a in zip(extractors, args):
+            if e is None:
+                key.append(type(a))
+            else:
+                k = e(a)
+                key.append(k if isinstance(k, type) else type(k))
+        if len(args) > n:
+            key.extend([type(a) for a in args[n:]])
+        return tuple(key)
+
+    return ret
+
+
+def _value_function(key_extractors: Sequence[Optional[KeyExtractor]]) -> Optional[Callable[[Sequence], Sequence]]:
+    """
+    :return: a function that returns the values that value-dependent filters match for a tuple of arguments, which are
+     the extracted values in positions with an extractor, and the arguments themselves elsewhere, or None if there are
+     no extractors
+    """
+    if not any(key_extractors):
+        return None
+    extractors = tuple(key_extractors)
+
+    def ret(args):
+        values = list(args)
+        for i, (e, a) in enumerate(zip(extractors, args)):
+            if e is not None:
+                values[i] = e(a)
+        return values
+
+    return ret
+
+
+def _arg_types(rows: List[Sequence]) -> List[Tuple[type, ...]]:
+    """
+    :return: the types of every row of arguments, specialized for rows of 1 to 4 arguments
+    """
+    n = len(rows[0]) if rows else 0
+    try:
+        if n == 2:
+            return [(type(a), type(b)) for a, b in rows]
+        if n == 1:
+            return [(type(a),) for a, in rows]
+        if n == 3:
+            return [(type(a), type(b), type(c)) for a, b, c in rows]
+        if n == 4:
+            return [(type(a), type(b), type(c), type(d)) for a, b, c, d in rows]
+    except ValueError:
+        # not all rows are of the same length
+        pass
+    return [tuple(map(type, args)) for args in rows]
+
+
+class _Raiser:
+    """
+    The last callback of a resolution that could not be resolved, raises an error when called
+    """
+    __slots__ = ('exc',)
+
+    def __init__(self, exc: Exception):
+        self.exc = exc
+
+    def __call__(self, *args, **kwargs) -> NoReturn:
+        raise self.exc
+
+
+def _synchronized(method):
+    """
+    make a MultiDispatch method hold the MultiDispatch's lock
+    """
+
+    @wraps(method)
+    def ret(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return ret
+
+
+class _LazyResolution:
+    """
+    A callback in a resolution, that resolves the callbacks it stands for only when it is called
+    """
+    __slots__ = ()
+
+    def _resolve(self, args) -> Resolution:
+        """
+        :return: the callbacks to call for args in place of this callback
+        """
+        raise NotImplementedError
+
+    def __call__(self, *args, **kwargs):
+        for callback in self._resolve(args):
+            ret = callback(*args, **kwargs)
+            if ret is not NotImplemented:
+                return ret
+        return ret
+
+
+class _Continuation(_LazyResolution):
+    """
+    The last callback of a resolution that was not fully resolved. When called, it resolves the next matching candidate,
+     memoizes the extended resolution in the lookup cache, and calls the rest of the resolution.
+    """
+    __slots__ = ('owner', 'prefix', 'applicable', 'start')
+
+    def __init__(self, owner: MultiDispatch, prefix: Resolution, applicable: Applicable, start: int):
+        self.owner = proxy(owner)
+        self.prefix = prefix
+        self.applicable = applicable
+        self.start = start
+
+    def _resolve(self, args) -> Resolution:
+        """
+        :return: the callbacks that follow the prefix for args
+        """
+        t_args = self.owner._key_of(args)
+        resolution = self.owner._extend_resolution(self.prefix, t_args, self.applicable, self.start)
+        self.owner._replace_resolution(t_args, self, resolution)
+        return resolution[len(self.prefix):]
+
+
+class _ValueSwitch(_LazyResolution):
+    """
+    The only callback of a resolution for argument types that candidates with value-dependent filters (like `Literal`)
+     might match. When called, the resolution is found by the values of the arguments in the value-dependent
+     positions, in a hash table. The switch does not store the argument types, since it is stored in the lookup cache,
+     whose keys must only be held weakly.
+    """
+    __slots__ = ('owner', 'applicable', 'value_candidates', 'positions', 'values_of', 'by_values', 'by_accepted')
+    # the maximum number of distinct values to memoize resolutions for, beyond it, the value-dependent candidates that
+    # accept the values are found by checking every one of them
+    max_values = 1024
+
+    def __init__(self, owner: MultiDispatch, applicable: Applicable, value_candidates: List[Candidate]):
+        """
+        :param value_candidates: the candidates in applicable with value-dependent filters, whose types might match
+        """
+        self.owner = proxy(owner)
+        self.applicable = applicable
+        self.value_candidates = value_candidates
+        self.positions = tuple(sorted({i for c in self.value_candidates for (i, _) in c.value_filters}))
+        self.values_of = owner._values_of
+        self.by_values: Dict[tuple, Resolution] = {}
+        # resolutions, by the value-dependent candidates that accept the values
+        self.by_accepted: Dict[FrozenSet[Candidate], Resolution] = {}
+
+    def _resolve(self, args) -> Resolution:
+        values = args if self.values_of is None else self.values_of(args)
+        key = tuple([values[i] for i in self.positions])
+        try:
+            ret = self.by_values.get(key)
+        except TypeError:
+            # unhashable values are never memoized
+            key = None
+            ret = None
+        if ret is not None:
+            return ret
+        accepted = frozenset(c for c in self.value_candidates if c.match_values(values))
+        ret = self.by_accepted.get(accepted)
+        if ret is None:
+            applicable = [(i, c) for (i, c) in self.applicable if not c.value_filters or c in accepted]
+            t_args = self.owner._key_of(args)
+            ret = self.by_accepted[accepted] = self.owner._extend_resolution((), t_args, applicable, 0)
+        if key is not None and len(self.by_values) < self.max_values:
+            self.by_values[key] = ret
+        return ret
+
+    def replace(self, continuation: _Continuation, resolution: Resolution):
+        """
+        replace the memoized resolutions that end with continuation with an extended resolution
+        """
+        for table in (self.by_accepted, self.by_values):
+            for key, value in list(table.items()):
+                if value[-1] is continuation:
+                    table[key] = resolution
+
+
+class PendingRegistration(NamedTuple):
+    func: Callable
+    extra_namespace: Optional[Mapping[str, Any]]
+    default_annotations: Optional[Mapping[str, Any]]
+    kwargs: Dict[str, Any]
+
+
+def _quick_arity(func) -> Optional[int]:
+    """
+    :return: the number of parameters `register` would make filters for, if it can be found without inspecting the
+     function's signature, or None otherwise
+    """
+    if type(func) is not FunctionType or hasattr(func, '__wrapped__') or hasattr(func, '__signature__'):
+        return None
+    code = func.__code__
+    # positional-only parameters end the filters
+    if getattr(code, 'co_posonlyargcount', 0):
+        return 0
+    ret = code.co_argcount
+    if not code.co_flags & CO_VARARGS:
+        ret += code.co_kwonlyargcount
+    return ret
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: Optional[int]
+    currsize: int
+    evictions: int
+    bytes: int
 
 
 class MultiDispatch(Generic[T], Callable[..., T]):
+    # a dispatcher is a public callable, so it keeps a __dict__ for attributes like __doc__ and __wrapped__
+    __slots__ = (
+        '__dict__', '__weakref__', '__name__', '_lock', 'default_callback', 'candidate_sets', '_key_extractors',
+        '_key_of', '_values_of', '_layers_cache', '_layer_indices', '_dispatch_indices', '_lookup_cache', '_maxsize',
+        '_old_lookup_cache', '_misses', '_evictions', '_hits_base', '_cache_token', '_abc_dependencies',
+        '_topology_verdicts', '_lookup_verdicts', '_frozen', '_statistics', '_hooks', '_active_hooks',
+        '_callback_candidates', '_call', '_call_hits', '_lazy', '_pending', '_dispatched_arities',
+    )
     _Implementors: MutableMapping[str, Implementor] = WeakValueDictionary()
+    _Continuation = _Continuation
+    _ValueSwitch = _ValueSwitch
+    # hooks that are called on the events of all MultiDispatches, and all the MultiDispatches that might call them
+    _global_hooks: List[Hook] = []
+    _instances: MutableSet[MultiDispatch] = WeakSet()
 
-    def __init__(self, default_callback: Callable[..., T]):
+    def __init__(self, default_callback: Callable[..., T], *, maxsize: Optional[int] = None,
+                 thread_safe: bool = False, key_extractors: Sequence[Optional[KeyExtractor]] = (), lazy: bool = False):
+        """
+        :param default_callback: the callback to call if no candidates match, or all of them return NotImplemented
+        :param maxsize: the maximum number of type tuples whose lookups are cached, or None for an unbounded cache.
+         When the cache is full, the least recently used lookups are evicted.
+        :param thread_safe: if true, the MultiDispatch can be called and registered to from multiple threads. Calls
+         with cached lookups are lock-free, while resolving new lookups, registering candidates, and invalidating caches
+         are serialized by a lock.
+        :param key_extractors: for every argument position, either a function that returns the class or value to
+         dispatch the argument by, or None to dispatch by the argument's type. Filters are matched against the
+         extracted classes (or the types of extracted values that are not classes), which are also the keys of the
+         lookup cache, and value-dependent filters (like Literal) are matched against the extracted values. Positions
+         beyond the sequence are dispatched by type.
+        :param lazy: if true, registering a plain function only stores it, and its type hints are resolved (and it is
+         added to the candidates) only when its arity is first dispatched. Functions are registered immediately if
+         their arity was already dispatched.
+        """
+        if maxsize is not None and maxsize < 0:
+            raise ValueError('maxsize must be non-negative')
+        self._lock = RLock() if thread_safe else nullcontext()
         self.default_callback = default_callback
         self.__name__ = default_callback.__name__
         self.candidate_sets: Dict[int, Set[Candidate]] = defaultdict(set)
+        self._key_extractors = tuple(key_extractors)
+        self._key_of = _key_function(self._key_extractors)
+        self._values_of = _value_function(self._key_extractors)
 
-        self._cache_token = get_cache_token()
         self._layers_cache: Dict[int, List[Set[Candidate]]] = {}
-        self._lookup_cache: Dict[int, WeakTupleDict[List[LookupLayer]]] = defaultdict(WeakTupleDict)
+        # for every arity with cached layers, the index of the layer of every candidate
+        self._layer_indices: Dict[int, Dict[Candidate, int]] = {}
+        self._dispatch_indices: Dict[int, DispatchIndex] = {}
+        self._lookup_cache: TypeTupleCache[Resolution] = TypeTupleCache(self._lock)
+
+        # a bounded lookup cache is split into two generations, new lookups are stored in _lookup_cache, and once it is
+        # half full, it becomes the old generation (evicting the previous old generation). Lookups found in the old
+        # generation are moved back to the new one. This approximates LRU without any bookkeeping on cache hits.
+        self._maxsize = maxsize
+        self._old_lookup_cache: TypeTupleCache[Resolution] = TypeTupleCache(self._lock)
+        self._misses = 0
+        self._evictions = 0
+        self._hits_base = 0
+
+        # ABC registrations can only change the results of arities whose candidates depend on ABCs, for these arities
+        # we store the results of the relevant subclass checks, and only clear caches whose checks changed
+        self._cache_token = get_cache_token()
+        self._abc_dependencies: Dict[int, AbcDependencies] = {}
+        self._topology_verdicts: Dict[int, FrozenSet[Tuple[type, type]]] = {}
+        self._lookup_verdicts: TypeTupleCache[FrozenSet[tuple]] = TypeTupleCache(self._lock)
+
+        self._frozen = False
+        self._statistics: Optional[DispatchStatistics] = None
+        self._hooks: List[Hook] = []
+        # the instance and global hooks, as of the last time the call path was built
+        self._active_hooks: Tuple[Hook, ...] = ()
+        self._callback_candidates: Dict[Callable, Candidate] = {}
+        self._lazy = lazy
+        # the arguments of the registrations that were deferred, by the arity of their functions
+        self._pending: Dict[int, List[PendingRegistration]] = {}
+        # the arities that were dispatched, registrations of these arities are not deferred
+        self._dispatched_arities: Set[int] = set()
+        self._instances.add(self)
 
+        self._call: Callable[..., T]
+        self._call_hits: Callable[[], int] = lambda: 0
+        self._rebuild_call_path()
+
+    @_synchronized
     def _add_candidate(self, func, filters, **kwargs):
+        if self._frozen:
+            raise FrozenDispatchError(f'cannot register candidates to {self.__name__}, it is frozen')
         cand = Candidate(func, filters, self, **kwargs)
-        self.candidate_sets[len(filters)].add(cand)
+        arity = len(filters)
+        if not self._is_abc_static():
+            # make sure the stored subclass checks are up to date before we recompute them
+            self._refresh_cache_token()
+        self.candidate_sets[arity].add(cand)
+        self._callback_candidates[func] = cand
+        dispatch_index = self._dispatch_indices.get(arity)
+        if dispatch_index is None:
+            dispatch_index = self._dispatch_indices[arity] = DispatchIndex(arity, self._lock)
+        dispatch_index.add(cand)
+
+        was_static = self._is_abc_static()
+        dependencies = self._abc_dependencies.get(arity)
+        if dependencies is None:
+            dependencies = self._abc_dependencies[arity] = AbcDependencies(arity)
+        dependencies_changed = dependencies.add(filters)
 
-        self.clear_cache(len(filters))
+        layers = self._layers_cache.get(arity)
+        if layers is None:
+            self.clear_cache(arity)
+        else:
+            # only lookups that a moved candidate might match can change
+            moved = topological_insert(layers, cand)
+            layer_indices = self._layer_indices[arity]
+            for i, layer in enumerate(layers):
+                for c in layer & moved:
+                    layer_indices[c] = i
+            for key in self._lookup_keys(arity):
+                if any(_might_match(c, key) for c in moved):
+                    self._discard_lookup(key)
+            if dependencies_changed and not dependencies.is_static():
+                self._topology_verdicts[arity] = dependencies.topology_verdicts()
+                for key in self._lookup_keys(arity):
+                    self._lookup_verdicts[key] = dependencies.lookup_verdicts(key)
 
+        if was_static and not self._is_abc_static():
+            # we need to start tracking the cache token
+            self._cache_token = get_cache_token()
+            self._rebuild_call_path()
+
+    @_synchronized
     def clear_cache(self, arg_len=None):
         if arg_len is None:
             self._layers_cache.clear()
+            self._layer_indices.clear()
             self._lookup_cache.clear()
+            self._old_lookup_cache.clear()
+            self._topology_verdicts.clear()
+            self._lookup_verdicts.clear()
         else:
             self._layers_cache.pop(arg_len, None)
-            self._lookup_cache.pop(arg_len, None)
+            self._layer_indices.pop(arg_len, None)
+            self._topology_verdicts.pop(arg_len, None)
+            for cache in (self._lookup_cache, self._old_lookup_cache, self._lookup_verdicts):
+                for key in cache.keys():
+                    if len(key) == arg_len:
+                        del cache[key]
+
+    def cache_info(self) -> CacheInfo:
+        """
+        :return: statistics of the lookup cache, in the style of `functools.lru_cache`
+        """
+        return CacheInfo(
+            hits=self._hits_base + self._call_hits(),
+            misses=self._misses,
+            maxsize=self._maxsize,
+            currsize=len(self._lookup_cache) + len(self._old_lookup_cache),
+            evictions=self._evictions,
+            bytes=sum(c.approximate_size()
+                      for c in (self._lookup_cache, self._old_lookup_cache, self._lookup_verdicts)),
+        )
+
+    @_synchronized
+    def prime(self, type_tuples: Iterable[Tuple[type, ...]] = (), *, subclasses: bool = False) -> int:
+        """
+        resolve and cache lookups ahead of time, so that the first calls with these types are as fast as later ones
+        :param type_tuples: the types of the arguments to resolve lookups for
+        :param subclasses: if true, also resolve lookups for every combination of the classes named in the registered
+         candidates' filters, and their currently loaded non-abstract subclasses. Subclasses of `object` are not
+         enumerated.
+        :return: the number of type tuples that were resolved
+        """
+        self.resolve_pending()
+        if not self._is_abc_static():
+            self._refresh_cache_token()
+        type_tuples = list(type_tuples)
+        if subclasses:
+            for arity, candidates in self.candidate_sets.items():
+                if candidates:
+                    type_tuples.extend(product(*(self._known_classes(candidates, i) for i in range(arity))))
+        for t_args in type_tuples:
+            resolution = self._get_resolution(t_args)
+            # resolve the entire resolution, in case a candidate returns NotImplemented
+            while isinstance(resolution[-1], _Continuation):
+                continuation = resolution[-1]
+                resolution = self._extend_resolution(continuation.prefix, t_args, continuation.applicable,
+                                                     continuation.start)
+                self._replace_resolution(t_args, continuation, resolution)
+        return len(type_tuples)
+
+    @staticmethod
+    def _known_classes(candidates: Iterable[Candidate], position: int) -> List[type]:
+        """
+        :return: all the classes named by the candidates' filters in a position, and all their loaded non-abstract
+         subclasses
+        """
+        ret = {}
+        stack = [cls for c in candidates for cls in c.filters[position].classes()]
+        while stack:
+            cls = stack.pop()
+            if cls in ret or not isinstance(cls, type):
+                continue
+            ret[cls] = None
+            if cls is not object:
+                stack.extend(type.__subclasses__(cls))
+        return [cls for cls in ret if not isabstract(cls)]
+
+    def enable_statistics(self):
+        """
+        start collecting statistics of the MultiDispatch's calls, resetting any previously collected statistics. Calls
+         are slower while statistics are enabled.
+        """
+        self._statistics = DispatchStatistics()
+        self._rebuild_call_path()
+
+    def disable_statistics(self):
+        self._statistics = None
+        self._rebuild_call_path()
+
+    def statistics(self) -> Optional[Dict[str, Any]]:
+        """
+        :return: a snapshot of the statistics collected since they were enabled, or None if they are disabled
+        """
+        if self._statistics is None:
+            return None
+        candidates = [c for arity in sorted(self.candidate_sets) for c in self.candidate_sets[arity]]
+        return self._statistics.snapshot(candidates, self.default_callback)
+
+    def add_hook(self, hook: Hook):
+        """
+        add a hook that is called on the MultiDispatch's events (see `TraceEvent`). Calls are slower while any hooks
+         are installed.
+        """
+        self._hooks.append(hook)
+        self._rebuild_call_path()
+
+    def remove_hook(self, hook: Hook):
+        self._hooks.remove(hook)
+        self._rebuild_call_path()
+
+    @classmethod
+    def add_global_hook(cls, hook: Hook):
+        """
+        add a hook that is called on the events of all MultiDispatches
+        """
+        MultiDispatch._global_hooks.append(hook)
+        for instance in list(MultiDispatch._instances):
+            instance._rebuild_call_path()
+
+    @classmethod
+    def remove_global_hook(cls, hook: Hook):
+        MultiDispatch._global_hooks.remove(hook)
+        for instance in list(MultiDispatch._instances):
+            instance._rebuild_call_path()
+
+    def _emit(self, event: TraceEvent, t_args: Optional[Tuple[type, ...]], candidate: Optional[Candidate]):
+        for hook in self._active_hooks:
+            hook(event, self, t_args, candidate)
+
+    def _trace_callback(self, t_args: Tuple[type, ...], callback: Callable, returned_not_implemented=False):
+        """
+        emit the events of a callback in a resolution, either before it is called, or after it returned NotImplemented
+        """
+        if callback is self.default_callback:
+            if not returned_not_implemented:
+                self._emit(TraceEvent.default_used, t_args, None)
+        elif isinstance(callback, _Raiser):
+            if isinstance(callback.exc, AmbiguityError):
+                self._emit(TraceEvent.ambiguity, t_args, None)
+        elif returned_not_implemented:
+            self._emit(TraceEvent.candidate_not_implemented, t_args, self._callback_candidates.get(callback))
+        else:
+            self._emit(TraceEvent.candidate_attempted, t_args, self._callback_candidates.get(callback))
+
+    @_synchronized
+    def freeze(self):
+        """
+        finalize the candidates of the MultiDispatch, registering candidates afterwards raises a FrozenDispatchError.
+         The candidates of all arities are sorted ahead of time. A frozen MultiDispatch can be called from multiple
+         threads, as if it was created with `thread_safe=True`: calls with cached lookups are lock-free, and resolving
+         new lookups is serialized by a lock.
+        """
+        if self._frozen:
+            return
+        self.resolve_pending()
+        if not self._is_abc_static():
+            self._refresh_cache_token()
+        for arity in self.candidate_sets:
+            self._topological_candidates(arity)
+        if isinstance(self._lock, nullcontext):
+            self._set_lock(RLock())
+        self._frozen = True
+
+    def _set_lock(self, lock: ContextManager):
+        """
+        replace the lock of the MultiDispatch and of all its caches
+        """
+        for cache in (self._lookup_cache, self._old_lookup_cache, self._lookup_verdicts):
+            cache.set_lock(lock)
+        for index in self._dispatch_indices.values():
+            index.set_lock(lock)
+        self._lock = lock
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def _is_abc_static(self) -> bool:
+        """
+        :return: whether no cached results can change due to `ABC.register`
+        """
+        return all(d.is_static() for d in self._abc_dependencies.values())
+
+    def _abc_dependencies_of(self, func_len) -> Optional[AbcDependencies]:
+        """
+        :return: the ABC dependencies of an arity, or None if the arity's results cannot change due to `ABC.register`
+        """
+        ret = self._abc_dependencies.get(func_len)
+        if ret is None or ret.is_static():
+            return None
+        return ret
 
     def _topological_candidates(self, func_len) -> List[Set[Candidate]]:
         if func_len in self._layers_cache:
             return self._layers_cache[func_len]
-        ret = self._layers_cache[func_len] = list(topological_sort(self.candidate_sets[func_len]))
+        dependencies = self._abc_dependencies_of(func_len)
+        if dependencies:
+            self._topology_verdicts[func_len] = dependencies.topology_verdicts()
+        if self._active_hooks:
+            self._emit(TraceEvent.topology_rebuild, None, None)
+        candidates = self.candidate_sets[func_len]
+        ret = self._layers_cache[func_len] = list(topological_sort(candidates, possible_envelopers(candidates)))
+        self._layer_indices[func_len] = {c: i for i, layer in enumerate(ret) for c in layer}
+        return ret
+
+    def _applicable_candidates(self, t_args: Tuple[type, ...]) -> Applicable:
+        """
+        :return: the candidates that might match t_args, found through the dispatch index, sorted by layer
+        """
+        dispatch_index = self._dispatch_indices.get(len(t_args))
+        if dispatch_index is None:
+            return []
+        self._topological_candidates(len(t_args))
+        layer_indices = self._layer_indices[len(t_args)]
+        ret = [(layer_indices[c], c) for c in dispatch_index.applicable(t_args)]
+        ret.sort(key=itemgetter(0))
         return ret
 
-    def _get_lookup_layers(self, t_args: Tuple[type, ...]) -> List[LookupLayer]:
-        cached_lookup = self._lookup_cache[len(t_args)].get(t_args)
-        if cached_lookup is not None:
-            return cached_lookup
-        ret = []
-        tc = self._topological_candidates(len(t_args))
-        for layer in tc:
+    def _next_lookup_layer(self, t_args: Tuple[type, ...], applicable: Applicable, start: int) \
+            -> Tuple[int, Optional[LookupLayer]]:
+        """
+        find the first layer, starting from index start of applicable, that has a candidate that matches t_args
+        :return: the index in applicable after the found layer, and either the matching candidate, or an error if the
+         layer could not be resolved to a single candidate. If no layer has a matching candidate, the returned layer is
+         None.
+        """
+        exact = self._dispatch_indices[len(t_args)].exact if applicable else ()
+        i = start
+        while i < len(applicable):
+            layer_index = applicable[i][0]
+            valid_cands = []
             try:
-                valid_cands = [c for c in layer if c.match(t_args)]
+                while i < len(applicable) and applicable[i][0] == layer_index:
+                    c = applicable[i][1]
+                    if c in exact or c.match(t_args):
+                        valid_cands.append(c)
+                    i += 1
             except TypeError as e:
-                ret.append(e)
-                break
+                return len(applicable), e
             if len(valid_cands) == 1:
-                ret.append(valid_cands[0])
+                return i, valid_cands[0]
             elif valid_cands:
-                ret.append(AmbiguityError(f'ambiguous call between {", ".join(str(v) for v in valid_cands)}'))
-                break
-        self._lookup_cache[len(t_args)][t_args] = ret
+                return i, AmbiguityError(f'ambiguous call between {", ".join(str(v) for v in valid_cands)}')
+        return len(applicable), None
+
+    @_synchronized
+    def _extend_resolution(self, prefix: Resolution, t_args: Tuple[type, ...], applicable: Applicable,
+                           start: int) -> Resolution:
+        """
+        extend a resolution prefix with the next matching candidate, found starting from index start of applicable
+        :return: the extended resolution, whose last callback is either the default callback, a callback that raises
+         an error, or a continuation that extends the resolution further.
+        """
+        index, layer = self._next_lookup_layer(t_args, applicable, start)
+        if layer is None:
+            return prefix + (self.default_callback,)
+        if isinstance(layer, Exception):
+            return prefix + (_Raiser(layer),)
+        if index == len(applicable):
+            return prefix + (layer.callback, self.default_callback)
+        return prefix + (layer.callback, self._Continuation(self, prefix + (layer.callback,), applicable, index))
+
+    @_synchronized
+    def _get_resolution(self, t_args: Tuple[type, ...]) -> Resolution:
+        """
+        :return: the callbacks to call, in order, for arguments of types t_args, until one does not return
+         NotImplemented. The last callback is either the default callback, a callback that raises an error, or a
+         continuation that resolves the rest of the callbacks only when it is called.
+        """
+        cached = self._lookup_cache.get(t_args)
+        if cached is not None:
+            return cached
+        if self._lazy and len(t_args) not in self._dispatched_arities:
+            self._resolve_pending(len(t_args))
+        cached = self._old_lookup_cache.pop(t_args)
+        if cached is not None:
+            self._hits_base += 1
+            self._store_resolution(t_args, cached)
+            return cached
+
+        self._misses += 1
+        if self._active_hooks:
+            self._emit(TraceEvent.cache_miss, t_args, None)
+        dependencies = self._abc_dependencies_of(len(t_args))
+        verdicts = dependencies and dependencies.lookup_verdicts(t_args)
+        applicable = self._applicable_candidates(t_args)
+        # a value switch is only needed if a value-dependent candidate matches the types, otherwise its values are never
+        # checked
+        value_candidates = [c for (_, c) in applicable if c.value_filters and c.might_match(t_args)]
+        if value_candidates:
+            ret = (self._ValueSwitch(self, applicable, value_candidates),)
+        else:
+            ret = self._extend_resolution((), t_args, applicable, 0)
+        if self._maxsize != 0:
+            if dependencies:
+                self._lookup_verdicts[t_args] = verdicts
+            self._store_resolution(t_args, ret)
         return ret
 
-    def __call__(self, *args, **kwargs):
+    @_synchronized
+    def _replace_resolution(self, t_args: Tuple[type, ...], continuation: _Continuation, resolution: Resolution):
+        """
+        replace the cached resolution of t_args with an extended resolution, if the cached resolution ends with
+         continuation, or if it is a value switch whose memoized resolutions might end with it
+        """
+        for cache in (self._lookup_cache, self._old_lookup_cache):
+            cached = cache.get(t_args)
+            if cached is not None:
+                if cached[-1] is continuation:
+                    cache[t_args] = resolution
+                elif isinstance(cached[-1], _ValueSwitch):
+                    cached[-1].replace(continuation, resolution)
+                return
+
+    def _store_resolution(self, t_args: Tuple[type, ...], resolution: Resolution):
+        if self._maxsize is not None and len(self._lookup_cache) >= max(self._maxsize // 2, 1):
+            self._rotate_lookup_cache()
+        self._lookup_cache[t_args] = resolution
+
+    def _rotate_lookup_cache(self):
+        """
+        evict the old generation of the lookup cache, and make the new generation the old one
+        """
+        if self._maxsize > 1:
+            evicted = self._old_lookup_cache
+            self._old_lookup_cache = self._lookup_cache
+        else:
+            evicted = self._lookup_cache
+        self._evictions += len(evicted)
+        for key in evicted.keys():
+            self._lookup_verdicts.pop(key)
+        evicted.clear()
+        self._lookup_cache = evicted
+        self._rebuild_call_path()
+
+    def _lookup_keys(self, arg_len) -> List[Tuple[type, ...]]:
+        """
+        :return: all the type tuples of length arg_len that have cached lookups
+        """
+        return [key for cache in (self._lookup_cache, self._old_lookup_cache) for key in cache.keys()
+                if len(key) == arg_len]
+
+    def _discard_lookup(self, t_args: Tuple[type, ...]):
+        self._lookup_cache.pop(t_args)
+        self._old_lookup_cache.pop(t_args)
+        self._lookup_verdicts.pop(t_args)
+
+    @_synchronized
+    def _refresh_cache_token(self):
         new_cache_token = get_cache_token()
-        if new_cache_token != self._cache_token:
-            # our cache is out of date and must be rebuilt
-            self.clear_cache()
-            self._cache_token = new_cache_token
-
-        t_args = tuple(type(a) for a in args)
-        ll = self._get_lookup_layers(t_args)
-        for layer in ll:
-            if isinstance(layer, Exception):
-                raise layer
-            ret = layer.callback(*args, **kwargs)
-            if ret is not NotImplemented:
-                return ret
-        return self.default_callback(*args, **kwargs)
+        if new_cache_token == self._cache_token:
+            return
+        self._cache_token = new_cache_token
+        if self._statistics is not None:
+            self._statistics.token_flushes += 1
+        # some ABC was registered to, only the caches that depend on changed subclass checks are out of date
+        for index in self._dispatch_indices.values():
+            index.refresh()
+        for func_len, verdicts in list(self._topology_verdicts.items()):
+            if verdicts != self._abc_dependencies[func_len].topology_verdicts():
+                self.clear_cache(func_len)
+        for key in self._lookup_verdicts.keys():
+            if self._lookup_verdicts.get(key) != self._abc_dependencies[len(key)].lookup_verdicts(key):
+                self._discard_lookup(key)
+
+    def _rebuild_call_path(self):
+        self._hits_base += self._call_hits()
+        self._active_hooks = (*self._hooks, *self._global_hooks)
+        self._call, self._call_hits = self._make_call_path()
+
+    def _make_call_path(self) -> Tuple[Callable[..., T], Callable[[], int]]:
+        """
+        create the function that is called when the MultiDispatch is called.
+        :return: the call function, and a function that returns the number of cache hits it encountered
+        """
+        if self._statistics is not None or self._active_hooks:
+            return self._make_instrumented_call_path()
+        if self._key_of is not _arg_types_of:
+            return self._make_keyed_call_path()
+        return self._make_fast_call_path()
+
+    def _make_instrumented_call_path(self) -> Tuple[Callable[..., T], Callable[[], int]]:
+        """
+        create a call function that collects statistics and calls hooks
+        :return: the call function, and a function that returns the number of cache hits it encountered
+        """
+        self_ = proxy(self)
+        lookup = self._lookup_cache
+        track_abc = not self._is_abc_static()
+        key_of = self._key_of
+        # if statistics are disabled, they are collected and discarded
+        stats = self._statistics or DispatchStatistics()
+        traced = bool(self._active_hooks)
+        hits = 0
+
+        def call(*args, **kwargs):
+            nonlocal hits
+            start = perf_counter()
+            if track_abc and get_cache_token() != self_._cache_token:
+                self_._refresh_cache_token()
+            t_args = key_of(args)
+            resolution = lookup.get(t_args)
+            if resolution is None:
+                resolution = self_._get_resolution(t_args)
+                stats.misses += 1
+            else:
+                hits += 1
+                stats.hits += 1
+            stats.calls += 1
+            stats.resolution_time += perf_counter() - start
+
+            callbacks = list(resolution)
+            depth = 0
+            for callback in callbacks:
+                if isinstance(callback, _LazyResolution):
+                    # the rest of the callbacks are resolved now, which counts as resolution time
+                    start = perf_counter()
+                    callbacks.extend(callback._resolve(args))
+                    stats.resolution_time += perf_counter() - start
+                    continue
+                if traced:
+                    self_._trace_callback(t_args, callback)
+                stats.callback_calls[callback] += 1
+                start = perf_counter()
+                try:
+                    ret = callback(*args, **kwargs)
+                finally:
+                    stats.body_time += perf_counter() - start
+                if ret is not NotImplemented:
+                    break
+                if traced:
+                    self_._trace_callback(t_args, callback, returned_not_implemented=True)
+                stats.callback_not_implemented[callback] += 1
+                depth += 1
+            stats.fallthrough_depths[depth] += 1
+            return ret
+
+        def get_hits():
+            return hits
+
+        return call, get_hits
+
+    def _make_keyed_call_path(self) -> Tuple[Callable[..., T], Callable[[], int]]:
+        """
+        create a call function that looks up the keys returned by the key extractors
+        :return: the call function, and a function that returns the number of cache hits it encountered
+        """
+        self_ = proxy(self)
+        hits = 0
+        lookup = self._lookup_cache
+        key_of = self._key_of
+        track_abc = not self._is_abc_static()
+
+        def call(*args, **kwargs):
+            nonlocal hits
+            if track_abc and get_cache_token() != self_._cache_token:
+                self_._refresh_cache_token()
+
+            t_args = key_of(args)
+            resolution = lookup.get(t_args)
+            if resolution is None:
+                resolution = self_._get_resolution(t_args)
+            else:
+                hits += 1
+
+            for callback in resolution:
+                ret = callback(*args, **kwargs)
+                if ret is not NotImplemented:
+                    return ret
+            return ret
+
+        def get_hits():
+            return hits
+
+        return call, get_hits
+
+    def _make_fast_call_path(self) -> Tuple[Callable[..., T], Callable[[], int]]:
+        """
+        create the function that is called when the MultiDispatch is called. Lookups are specialized for arities 1
+         through 4, walking the lookup cache's trie directly without allocating, and the returned function only holds
+         a weak reference to the MultiDispatch. If no candidate depends on an ABC, the ABC cache token is not checked
+         at all.
+
+        :return: the call function, and a function that returns the number of cache hits it encountered
+        """
+        self_ = proxy(self)
+        hits = 0
+        lookup = self._lookup_cache
+        root1, root2, root3, root4 = (lookup.root(i) for i in range(1, 5))
+        empty = {}
+        track_abc = not self._is_abc_static()
+
+        def call(*args, **kwargs):
+            nonlocal hits
+            if track_abc and get_cache_token() != self_._cache_token:
+                self_._refresh_cache_token()
+
+            n = len(args)
+            if n == 2:
+                resolution = root2.get(ref(type(args[0])), empty).get(ref(type(args[1])))
+            elif n == 1:
+                resolution = root1.get(ref(type(args[0])))
+            elif n == 3:
+                resolution = root3.get(ref(type(args[0])), empty).get(ref(type(args[1])), empty) \
+                    .get(ref(type(args[2])))
+            elif n == 4:
+                resolution = root4.get(ref(type(args[0])), empty).get(ref(type(args[1])), empty) \
+                    .get(ref(type(args[2])), empty).get(ref(type(args[3])))
+            else:
+                resolution = lookup.get(tuple(map(type, args)))
+            if resolution is None:
+                resolution = self_._get_resolution(tuple(map(type, args)))
+            else:
+                hits += 1
+
+            for callback in resolution:
+                ret = callback(*args, **kwargs)
+                if ret is not NotImplemented:
+                    return ret
+            return ret
+
+        def get_hits():
+            return hits
+
+        return call, get_hits
+
+    # the call path is stored per-instance, and is retrieved (with no python-level overhead) when the MultiDispatch is
+    # called
+    __call__ = property(attrgetter('_call'))
 
     def register(self, func=None, extra_namespace=None, default_annotations=None, **kwargs):
         if not func:
             return partial(self.register, **kwargs)
 
+        if self._lazy:
+            arity = _quick_arity(func)
+            pending = PendingRegistration(func, extra_namespace, default_annotations, kwargs)
+            if arity is not None and self._defer(arity, pending):
+                return func
+        return self._register_now(func, extra_namespace, default_annotations, **kwargs)
+
+    @_synchronized
+    def _defer(self, arity: int, pending: PendingRegistration) -> bool:
+        """
+        :return: whether the registration was deferred until its arity is dispatched
+        """
+        if arity in self._dispatched_arities:
+            return False
+        if self._frozen:
+            raise FrozenDispatchError(f'cannot register candidates to {self.__name__}, it is frozen')
+        self._pending.setdefault(arity, []).append(pending)
+        return True
+
+    @_synchronized
+    def _resolve_pending(self, arity: int):
+        """
+        complete the deferred registrations of an arity, and mark it as dispatched. If a registration fails (for
+         example, if its type hints cannot be resolved yet), it and the registrations after it stay pending.
+        """
+        pending = self._pending.get(arity)
+        while pending:
+            func, extra_namespace, default_annotations, kwargs = pending[0]
+            self._register_now(func, extra_namespace, default_annotations, **kwargs)
+            pending.pop(0)
+        self._pending.pop(arity, None)
+        self._dispatched_arities.add(arity)
+
+    def resolve_pending(self):
+        """
+        complete all the deferred registrations of a lazy MultiDispatch
+        """
+        for arity in list(self._pending):
+            self._resolve_pending(arity)
+
+    def _register_now(self, func, extra_namespace=None, default_annotations=None, **kwargs):
         sign = signature(func)
         type_hints = get_type_hints(func, localns=extra_namespace)
         if default_annotations:
@@ -143,7 +1161,68 @@ class MultiDispatch(Generic[T], Callable[..., T]):
         self._add_candidate(func, tuple(filters), **kwargs)
         return func
 
+    def map(self, args_iterable: Iterable[Sequence], **kwargs) -> List[T]:
+        """
+        call the MultiDispatch for every tuple of arguments. Every distinct tuple of argument types is resolved once,
+         and the arguments are then dispatched directly to the resolved candidates.
+        :param args_iterable: the positional arguments of every call
+        :param kwargs: the keyword arguments of all the calls
+        :return: the results of the calls, in order
+        """
+        rows = list(args_iterable)
+        if self._statistics is not None or self._active_hooks:
+            return [self(*args, **kwargs) for args in rows]
+        if not self._is_abc_static():
+            self._refresh_cache_token()
+
+        keys = _arg_types(rows) if self._key_of is _arg_types_of else [self._key_of(args) for args in rows]
+        resolutions: Dict[Tuple[type, ...], Resolution] = dict.fromkeys(keys)
+        uncached = 0
+        for t_args in resolutions:
+            resolution = self._lookup_cache.get(t_args)
+            if resolution is None:
+                # the first row of the key is counted by _get_resolution, as a miss or a hit in the old generation
+                uncached += 1
+                resolution = self._get_resolution(t_args)
+            resolutions[t_args] = resolution
+        self._hits_base += len(rows) - uncached
+
+        results = []
+        append = results.append
+        for t_args, args in zip(keys, rows):
+            resolution = resolutions[t_args]
+            ret = resolution[0](*args, **kwargs)
+            if ret is NotImplemented and len(resolution) > 1:
+                ret, resolutions[t_args] = self._fall_through(resolution, 1, args, kwargs)
+            append(ret)
+        return results
+
+    def map_columns(self, *columns: Iterable, **kwargs) -> List[T]:
+        """
+        call the MultiDispatch for every row of arguments, equivalent to `map(zip(*columns))`
+        """
+        return self.map(zip(*columns), **kwargs)
+
+    def _fall_through(self, resolution: Resolution, start: int, args, kwargs) -> Tuple[T, Resolution]:
+        """
+        call the callbacks of a resolution from index start, until one does not return NotImplemented, resolving
+         continuations along the way
+        :return: the return value, and the resolution with any resolved continuations replaced
+        """
+        i = start
+        while True:
+            callback = resolution[i]
+            if isinstance(callback, _Continuation):
+                resolution = resolution[:i] + callback._resolve(args)
+                continue
+            ret = callback(*args, **kwargs)
+            i += 1
+            if ret is not NotImplemented or i == len(resolution):
+                return ret, resolution
+
     def implement(self, key, **kwargs):
+        if self._frozen:
+            raise FrozenDispatchError(f'cannot implement candidates for {self.__name__}, it is frozen')
         implementor = self._Implementors.get(key)
         if not implementor:
             implementor = self._Implementors[key] = Implementor()
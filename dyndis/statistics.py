@@ -0,0 +1,45 @@
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from dyndis.multidispatch import Candidate
+
+
+class DispatchStatistics:
+    """
+    Counters of the calls of a MultiDispatch, only collected while its statistics are enabled
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.misses = 0
+        # the number of times the ABC cache token changed, and cached results were re-validated
+        self.token_flushes = 0
+        # for every number of callbacks that returned NotImplemented in a call, the number of such calls
+        self.fallthrough_depths: Dict[int, int] = defaultdict(int)
+        self.callback_calls: Dict[Callable, int] = defaultdict(int)
+        self.callback_not_implemented: Dict[Callable, int] = defaultdict(int)
+        # total seconds spent finding the callbacks to call, and in the callbacks
+        self.resolution_time = 0.0
+        self.body_time = 0.0
+
+    def snapshot(self, candidates: Iterable['Candidate'], default_callback: Callable) -> Dict[str, Any]:
+        """
+        :return: a dict of plain values, with the counters of every candidate (including ones that were never
+         called) keyed by the candidate's string representation
+        """
+        candidates = list(candidates)
+        return {
+            'calls': self.calls,
+            'hits': self.hits,
+            'misses': self.misses,
+            'token_flushes': self.token_flushes,
+            'fallthrough_depths': dict(sorted(self.fallthrough_depths.items())),
+            'candidate_calls': {str(c): self.callback_calls.get(c.callback, 0) for c in candidates},
+            'candidate_not_implemented': {str(c): self.callback_not_implemented.get(c.callback, 0)
+                                          for c in candidates},
+            'default_calls': self.callback_calls.get(default_callback, 0),
+            'resolution_time': self.resolution_time,
+            'body_time': self.body_time,
+        }
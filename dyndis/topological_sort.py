@@ -1,23 +1,32 @@
 from collections import defaultdict
-from typing import TypeVar, Iterable, Iterator, Set
+from typing import TypeVar, Iterable, Iterator, Set, List, Optional, Callable
 
 T = TypeVar('T')
 
 
-def topological_sort(members: Iterable[T]) -> Iterator[Set[T]]:
-    dependencies = {}
+def topological_sort(members: Iterable[T],
+                     possible_envelopers: Optional[Callable[[T], Iterable[T]]] = None) -> Iterator[Set[T]]:
+    """
+    Sort members into layers, so that every member comes after all the members it envelops.
+
+    :param members: the members to sort
+    :param possible_envelopers: if provided, a function that returns, for a member, a superset of the members that
+     might envelop it. Only these members will be compared to it.
+    """
+    members = list(members)
+    if possible_envelopers is None:
+        def possible_envelopers(_):
+            return members
+
+    dependencies = defaultdict(set)
     dependants = defaultdict(set)
-    next_layer = set()
-    for a in members:
-        d = set()
-        for b in members:
+    for b in members:
+        for a in possible_envelopers(b):
             if a.envelops(b):
-                d.add(b)
+                dependencies[a].add(b)
                 dependants[b].add(a)
-        if d:
-            dependencies[a] = d
-        else:
-            next_layer.add(a)
+    next_layer = {m for m in members if m not in dependencies}
+    dependencies = dict(dependencies)
 
     yield next_layer
 
@@ -33,3 +42,41 @@ def topological_sort(members: Iterable[T]) -> Iterator[Set[T]]:
             raise RuntimeError('cycle')
         next_layer = new_layer
         yield next_layer
+
+
+def topological_insert(layers: List[Set[T]], new: T) -> Set[T]:
+    """
+    Insert a new member into layers (as yielded by topological_sort) in-place, so that the layers are the same as if
+     all the members were sorted again.
+
+    :return: all the members whose layer changed, including the new member
+    """
+    # since envelopment is transitive, the new member's layer is right above the highest layer with a member it
+    # envelops, and all the members that envelop it are in higher layers
+    new_layer = 0
+    dependants = set()
+    for i in range(len(layers) - 1, -1, -1):
+        if any(new.envelops(m) for m in layers[i]):
+            new_layer = i + 1
+            break
+        dependants.update(m for m in layers[i] if m.envelops(new))
+
+    if new_layer == len(layers):
+        layers.append(set())
+    layers[new_layer].add(new)
+    moved = {new}
+
+    # members that envelop a member that was moved up to their own layer must also be moved up
+    to_push = layers[new_layer] & dependants
+    level = new_layer
+    while to_push:
+        layers[level] -= to_push
+        if level + 1 == len(layers):
+            layers.append(set())
+        next_layer = layers[level + 1]
+        next_push = {m for m in next_layer & dependants if any(m.envelops(p) for p in to_push)}
+        next_layer |= to_push
+        moved |= to_push
+        to_push = next_push
+        level += 1
+    return moved
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from enum import Enum
+from typing import Callable, Optional, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from dyndis.multidispatch import Candidate, MultiDispatch
+
+
+class TraceEvent(Enum):
+    """
+    The events of a MultiDispatch that are sent to its hooks
+    """
+    # a lookup was resolved for a type tuple that was not in the lookup cache
+    cache_miss = 'cache_miss'
+    # the candidates of an arity were sorted from scratch, the type tuple is None
+    topology_rebuild = 'topology_rebuild'
+    # a candidate is about to be called
+    candidate_attempted = 'candidate_attempted'
+    # a candidate returned NotImplemented
+    candidate_not_implemented = 'candidate_not_implemented'
+    # the default callback is about to be called, the candidate is None
+    default_used = 'default_used'
+    # an AmbiguityError is about to be raised, the candidate is None
+    ambiguity = 'ambiguity'
+
+
+# a hook is called with the event, the MultiDispatch, the type tuple of the call, and the relevant candidate
+Hook = Callable[[TraceEvent, 'MultiDispatch', Optional[Tuple[type, ...]], Optional['Candidate']], None]
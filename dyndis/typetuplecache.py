@@ -0,0 +1,300 @@
+from contextlib import nullcontext
+from sys import getsizeof
+from typing import Any, ContextManager, Dict, Generic, Iterator, List, Optional, Set, Tuple, TypeVar, Union
+from weakref import ref
+
+V = TypeVar('V')
+
+_missing = object()
+
+RefTuple = Tuple[ref, ...]
+
+
+class _Watcher(ref):
+    """
+    A callback weak reference to a type, that remembers the plain weak reference of the type
+    """
+    __slots__ = ('plain',)
+
+    def __init__(self, ob, callback, plain: ref):
+        super().__init__(ob, callback)
+        self.plain = plain
+
+    def __new__(cls, ob, callback, plain: ref):
+        return super().__new__(cls, ob, callback)
+
+
+class TypeTupleCache(Generic[V]):
+    """
+    A mapping from tuples of types to values, that holds the types weakly. An entry is removed once any of the types in
+     its key is garbage collected.
+
+    The entries are stored in a trie of dicts, one trie for every key length, with one level for every position in the
+     key. Each level is keyed by the plain weak reference (without a callback) of the type in that position. Since
+     python re-uses the plain weak reference of an object, and the trie keeps these references alive, looking up a key
+     allocates nothing, and can be done directly on the trie (see `root`).
+
+    Each type in a key has a single callback weak reference, that removes all the entries whose keys contain the type.
+     Since the callback can run on any thread, a lock can be provided, that the callback holds while removing entries.
+     The callback can also run on the same thread, during any allocation, so removals that happen while the trie is
+     being iterated or changed are deferred until it is done (like in `weakref.WeakValueDictionary`).
+    """
+
+    def __init__(self, lock: Optional[ContextManager] = None):
+        self._roots: Dict[int, dict] = {}
+        # for every type in a key, the key (as a tuple of weak references) of the entry that contains it, or a set of
+        # keys if multiple entries contain it
+        self._keys_by_type: Dict[ref, Union[RefTuple, Set[RefTuple]]] = {}
+        # for every type in a key, its callback weak reference
+        self._watchers: Dict[ref, _Watcher] = {}
+        self._len = 0
+        self._lock = lock or nullcontext()
+        # the number of iterations and changes of the trie that are in progress, and the plain weak references of the
+        # types whose entries are to be removed once there are none
+        self._guards = 0
+        self._pending_removals: List[ref] = []
+
+        self_ref = ref(self)
+
+        def remove(watcher: _Watcher):
+            self_ = self_ref()
+            if self_ is not None:
+                with self_._lock:
+                    self_._pending_removals.append(watcher.plain)
+                    if not self_._guards:
+                        self_._guards += 1
+                        self_._release()
+
+        self._remove = remove
+
+    def set_lock(self, lock: ContextManager):
+        """
+        replace the lock that the callbacks hold while removing entries
+        """
+        self._lock = lock
+
+    def root(self, key_len: int) -> dict:
+        """
+        :return: the root level of the trie for keys of length key_len. The root is never replaced, so it can be stored
+         to perform lookups directly.
+        """
+        ret = self._roots.get(key_len)
+        if ret is None:
+            ret = self._roots[key_len] = {}
+        return ret
+
+    def get(self, key: Tuple[type, ...], default=None):
+        node = self._roots.get(len(key))
+        if node is None:
+            return default
+        if not key:
+            return node.get((), default)
+        for t in key:
+            node = node.get(ref(t), _missing)
+            if node is _missing:
+                return default
+        return node
+
+    def __getitem__(self, key: Tuple[type, ...]) -> V:
+        ret = self.get(key, _missing)
+        if ret is _missing:
+            raise KeyError(key)
+        return ret
+
+    def __contains__(self, key: Tuple[type, ...]):
+        return self.get(key, _missing) is not _missing
+
+    def __setitem__(self, key: Tuple[type, ...], value: V):
+        self._guards += 1
+        try:
+            self._set(key, value)
+        finally:
+            self._release()
+
+    def _set(self, key: Tuple[type, ...], value: V):
+        refs = tuple(map(ref, key))
+        node = self.root(len(key))
+        if not key:
+            if () not in node:
+                self._len += 1
+            node[()] = value
+            return
+
+        for r in refs[:-1]:
+            next_node = node.get(r)
+            if next_node is None:
+                # setdefault is atomic, so concurrent insertions never replace each other's nodes
+                next_node = node.setdefault(r, {})
+            node = next_node
+        if refs[-1] not in node:
+            self._len += 1
+            for t, r in zip(key, refs):
+                self._watch(t, r, refs)
+        node[refs[-1]] = value
+
+    def _release(self):
+        """
+        end an iteration or a change of the trie, applying the deferred removals if it was the last one in progress
+        """
+        self._guards -= 1
+        pending = self._pending_removals
+        while pending and not self._guards:
+            self._guards += 1
+            try:
+                self._discard_type(pending.pop())
+            finally:
+                self._guards -= 1
+
+    def _watch(self, t: type, r: ref, refs: RefTuple):
+        """
+        register that the entry with the key refs contains the type t, whose plain weak reference is r
+        """
+        keys = self._keys_by_type.get(r)
+        if keys is None:
+            # most types are only in a single key, so we avoid creating a set for them
+            self._keys_by_type[r] = refs
+            self._watchers[r] = _Watcher(t, self._remove, r)
+        elif isinstance(keys, set):
+            keys.add(refs)
+        elif keys != refs:
+            self._keys_by_type[r] = {keys, refs}
+
+    def _discard_type(self, r: ref):
+        self._watchers.pop(r, None)
+        keys = self._keys_by_type.pop(r, None)
+        if keys is None:
+            # the entries were already removed
+            return
+        if not isinstance(keys, set):
+            keys = (keys,)
+        for refs in keys:
+            self._discard(refs)
+
+    def _discard(self, refs: RefTuple) -> Any:
+        """
+        remove an entry by its key's weak references.
+        :return: the removed value, or _missing if the entry does not exist
+        """
+        if not refs:
+            root = self._roots.get(0)
+            ret = _missing if root is None else root.pop((), _missing)
+            if ret is not _missing:
+                self._len -= 1
+            return ret
+
+        path = [self._roots.get(len(refs))]
+        for r in refs[:-1]:
+            if path[-1] is None:
+                return _missing
+            path.append(path[-1].get(r))
+        leaf = path[-1]
+        if leaf is None:
+            return _missing
+        ret = leaf.pop(refs[-1], _missing)
+        if ret is _missing:
+            return ret
+        self._len -= 1
+        # prune the empty levels, the root is kept
+        for node, parent, r in zip(reversed(path[1:]), reversed(path[:-1]), reversed(refs[:-1])):
+            if node:
+                break
+            del parent[r]
+        for r in set(refs):
+            keys = self._keys_by_type.get(r)
+            if isinstance(keys, set):
+                keys.discard(refs)
+                if len(keys) == 1:
+                    self._keys_by_type[r], = keys
+            elif keys == refs:
+                del self._keys_by_type[r]
+                del self._watchers[r]
+        return ret
+
+    def pop(self, key: Tuple[type, ...], default=None):
+        self._guards += 1
+        try:
+            ret = self._discard(tuple(map(ref, key)))
+        finally:
+            self._release()
+        if ret is _missing:
+            return default
+        return ret
+
+    def __delitem__(self, key: Tuple[type, ...]):
+        if self.pop(key, _missing) is _missing:
+            raise KeyError(key)
+
+    def __len__(self):
+        return self._len
+
+    def _refs(self) -> Iterator[RefTuple]:
+        for key_len, root in self._roots.items():
+            if key_len == 0:
+                if () in root:
+                    yield ()
+                continue
+            stack: List[Tuple[RefTuple, dict]] = [((), root)]
+            while stack:
+                prefix, node = stack.pop()
+                if len(prefix) == key_len - 1:
+                    for r in node:
+                        yield prefix + (r,)
+                else:
+                    stack.extend((prefix + (r,), child) for r, child in node.items())
+
+    def keys(self) -> List[Tuple[type, ...]]:
+        """
+        :return: a list of the live keys in the cache
+        """
+        ret = []
+        self._guards += 1
+        try:
+            for refs in self._refs():
+                key = tuple(r() for r in refs)
+                if None not in key:
+                    ret.append(key)
+        finally:
+            self._release()
+        return ret
+
+    def approximate_size(self) -> int:
+        """
+        :return: the approximate number of bytes used by the cache, including the (shallow) size of the values, but not
+         including the types themselves
+        """
+        self._guards += 1
+        try:
+            return self._approximate_size()
+        finally:
+            self._release()
+
+    def _approximate_size(self) -> int:
+        ret = getsizeof(self) + getsizeof(self._roots) + getsizeof(self._keys_by_type) + getsizeof(self._watchers)
+        for key_len, root in self._roots.items():
+            stack = [(0, root)]
+            while stack:
+                depth, node = stack.pop()
+                ret += getsizeof(node)
+                if depth == key_len - 1 or key_len == 0:
+                    ret += sum(getsizeof(v) for v in node.values())
+                else:
+                    stack.extend((depth + 1, child) for child in node.values())
+        for r, keys in self._keys_by_type.items():
+            # each type has a plain weak reference and a watcher
+            ret += getsizeof(r) + getsizeof(self._watchers[r])
+            if isinstance(keys, set):
+                ret += getsizeof(keys)
+        # each key is stored as a tuple of weak references
+        ret += sum(getsizeof(refs) for refs in self._refs())
+        return ret
+
+    def clear(self):
+        self._guards += 1
+        try:
+            for root in self._roots.values():
+                root.clear()
+            self._keys_by_type.clear()
+            self._watchers.clear()
+            self._len = 0
+        finally:
+            self._release()
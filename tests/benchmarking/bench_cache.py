@@ -0,0 +1,50 @@
+from weakref import ref
+
+from dyndis.typetuplecache import TypeTupleCache
+from tests.benchmarking.registry import benchmark, Measurement, time_per_call, allocated_memory
+from tests.benchmarking.util import class_tree
+
+GROUP = 'lookup cache'
+
+
+def _filled(size: int):
+    classes = class_tree(size)
+    cache = TypeTupleCache()
+    strong = {}
+    for i, a in enumerate(classes):
+        b = classes[(i * 7) % size]
+        cache[a, b] = i
+        strong[a, b] = i
+    return classes, cache, strong
+
+
+@benchmark
+def type_tuple_cache_lookup():
+    classes, cache, strong = _filled(1000)
+    a, b = classes[10], classes[70]
+    missing = classes[11]
+    root = cache.root(2)
+    empty = {}
+
+    yield Measurement(GROUP, 'strong dict hit (reference)', time_per_call(lambda: strong.get((a, b))), 'ns')
+    yield Measurement(GROUP, 'trie walk hit', time_per_call(lambda: root.get(ref(a), empty).get(ref(b))), 'ns')
+    yield Measurement(GROUP, 'trie walk miss', time_per_call(lambda: root.get(ref(a), empty).get(ref(missing))),
+                      'ns')
+    yield Measurement(GROUP, 'get hit', time_per_call(lambda: cache.get((a, b))), 'ns')
+    yield Measurement(GROUP, 'get miss', time_per_call(lambda: cache.get((a, missing))), 'ns')
+
+
+@benchmark
+def type_tuple_cache_memory():
+    size = 1000
+    classes = class_tree(size)
+    for fan_out in (1, 10):
+        def fill():
+            ret = TypeTupleCache()
+            for i, a in enumerate(classes):
+                for j in range(fan_out):
+                    ret[a, classes[(i * 7 + j) % size]] = None
+            return ret
+
+        yield Measurement(GROUP, f'bytes per entry, {fan_out} entries per leading type',
+                          allocated_memory(fill) / (size * fan_out), 'bytes')
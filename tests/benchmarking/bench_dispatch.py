@@ -0,0 +1,341 @@
+from abc import ABC
+from types import new_class
+from typing import Hashable, Literal, Protocol, TypeVar, Union, Optional, runtime_checkable
+
+from dyndis import AmbiguityError
+
+from tests.benchmarking.registry import benchmark, Measurement, time_per_call, time_once
+from tests.benchmarking.util import make_candidate, make_dispatch, class_tree, class_chain
+
+GROUP = 'dispatch'
+
+
+def _operator_dispatch(arity: int, n_classes: int = 10):
+    """
+    create a dispatch with a candidate for each class in a small tree, for every position
+    """
+    classes = class_tree(n_classes)
+    md = make_dispatch(arity)
+    for i, cls in enumerate(classes):
+        md.register(make_candidate([cls] * arity, i))
+    return md, classes
+
+
+@benchmark
+def warm_call():
+    def direct(*args):
+        return None
+
+    yield Measurement(GROUP, 'direct python call (reference)', time_per_call(lambda: direct(0, 0)), 'ns')
+
+    for arity in (1, 2, 3, 4):
+        md, classes = _operator_dispatch(arity)
+        args = tuple(classes[-1]() for _ in range(arity))
+        md(*args)
+        yield Measurement(GROUP, f'warm call, arity {arity}', time_per_call(lambda: md(*args)), 'ns')
+
+
+@benchmark
+def warm_call_fallthrough():
+    for depth in (1, 4, 16):
+        md = make_dispatch(1)
+        classes = class_chain(depth)
+        md.register(make_candidate([classes[0]], 'found'))
+        for cls in classes[1:]:
+            md.register(make_candidate([cls], NotImplemented))
+        arg = classes[-1]()
+        assert md(arg) == 'found'
+        yield Measurement(GROUP, f'warm call, {depth} candidates deep', time_per_call(lambda: md(arg)), 'ns')
+
+
+@benchmark
+def cold_call():
+    calls = 500
+    for arity in (1, 2):
+        md, classes = _operator_dispatch(arity, 40)
+        md(*(classes[-1]() for _ in range(arity)))
+        leaves = [tuple(type('Leaf', (classes[(i + j) % len(classes)],), {})() for j in range(arity))
+                  for i in range(calls)]
+
+        def call_all():
+            for args in leaves:
+                md(*args)
+
+        yield Measurement(GROUP, f'cold call, arity {arity}', time_once(call_all) / calls, 'ns')
+
+
+@benchmark
+def register():
+    for existing in (10, 100, 1000):
+        classes = class_tree(existing + 1)
+        candidates = [make_candidate([cls, object], i) for i, cls in enumerate(classes)]
+        md = make_dispatch(2)
+        for c in candidates[:-1]:
+            md.register(c)
+        md(classes[0](), None)
+        last = candidates[-1]
+        args = (classes[-1](), None)
+
+        def register_and_call():
+            md.register(last)
+            md(*args)
+
+        yield Measurement(GROUP, f'register + first call, {existing} existing candidates',
+                          time_once(register_and_call), 'ns')
+
+    md = make_dispatch(2)
+    classes = class_tree(1000)
+    candidates = iter([make_candidate([cls, object], i) for i, cls in enumerate(classes)])
+    yield Measurement(GROUP, 'register, no call', time_per_call(lambda: md.register(next(candidates)),
+                                                                  number=100, repeat=10), 'ns')
+
+
+@benchmark
+def deep_hierarchy():
+    for depth in (10, 100):
+        chain = class_chain(depth)
+        md = make_dispatch(2)
+        for i, cls in enumerate(chain):
+            md.register(make_candidate([cls, object], i))
+        args = (chain[-1](), None)
+        yield Measurement(GROUP, f'cold call, hierarchy depth {depth}', time_once(lambda: md(*args)), 'ns')
+        yield Measurement(GROUP, f'warm call, hierarchy depth {depth}', time_per_call(lambda: md(*args)), 'ns')
+        leaves = [(type('Leaf', (chain[-1],), {})(), None) for _ in range(100)]
+
+        def call_leaves():
+            for leaf in leaves:
+                md(*leaf)
+
+        yield Measurement(GROUP, f'cold call of a new type, hierarchy depth {depth}',
+                          time_once(call_leaves) / len(leaves), 'ns')
+
+
+@benchmark
+def union_and_typevar():
+    classes = class_tree(30)
+    T = TypeVar('T')
+    S = TypeVar('S', *classes[1:4])
+    B = TypeVar('B', bound=Union[classes[1], classes[2]])
+    md = make_dispatch(2)
+    for i in range(0, len(classes) - 2, 3):
+        md.register(make_candidate([Union[classes[i], classes[i + 1], classes[i + 2]], Optional[classes[i]]], i))
+    md.register(make_candidate([T, T], 'T'))
+    md.register(make_candidate([S, S], 'S'))
+    md.register(make_candidate([B, Union[B, None]], 'B'))
+
+    leaves = [(type('Leaf', (cls,), {})(), type('Leaf', (cls,), {})()) for cls in classes for _ in range(10)]
+
+    def call_all():
+        for args in leaves:
+            try:
+                md(*args)
+            except AmbiguityError:
+                pass
+
+    yield Measurement(GROUP, 'cold call, union and typevar signatures', time_once(call_all) / len(leaves), 'ns')
+    args = leaves[0]
+    md(*args)
+    yield Measurement(GROUP, 'warm call, union and typevar signatures', time_per_call(lambda: md(*args)), 'ns')
+
+
+@benchmark
+def abc_register_invalidation():
+    class Unrelated(ABC):
+        pass
+
+    for abstract in (False, True):
+        md, classes = _operator_dispatch(2, 40)
+        if abstract:
+            class Abstract(ABC):
+                pass
+
+            md.register(make_candidate([Abstract, Abstract], 'abstract'))
+        args = [(cls(), cls()) for cls in classes]
+
+        def register_and_call():
+            Unrelated.register(type('Virtual', (), {}))
+            for a in args:
+                md(*a)
+
+        for a in args:
+            md(*a)
+        kind = 'with' if abstract else 'without'
+        yield Measurement(GROUP, f'calls after an unrelated ABC.register, {kind} ABC candidates',
+                          time_once(register_and_call) / len(args), 'ns')
+
+
+@benchmark
+def many_overloads():
+    for n_classes in (10, 100, 500):
+        # every pair of classes from two independent trees has its own candidate
+        side = int(n_classes ** 0.5) or 1
+        left = class_tree(n_classes // side, prefix='A')
+        right = class_tree(side, prefix='B')
+        md = make_dispatch(2)
+        for i, a in enumerate(left):
+            for j, b in enumerate(right):
+                md.register(make_candidate([a, b], (i, j)))
+        md(left[0](), right[0]())
+        leaves = [(type('Leaf', (left[i % len(left)],), {})(), type('Leaf', (right[i % len(right)],), {})())
+                  for i in range(200)]
+
+        def call_all():
+            for args in leaves:
+                md(*args)
+
+        yield Measurement(GROUP, f'cold call, {len(left) * len(right)} overloads',
+                          time_once(call_all) / len(leaves), 'ns')
+
+
+@benchmark
+def freeze():
+    for frozen in (False, True):
+        md, classes = _operator_dispatch(2, 300)
+        args = (classes[-1](), classes[-1]())
+        if frozen:
+            md.freeze()
+        kind = 'frozen' if frozen else 'not frozen'
+        yield Measurement(GROUP, f'first call, 300 candidates, {kind}', time_once(lambda: md(*args)), 'ns')
+        yield Measurement(GROUP, f'warm call, 300 candidates, {kind}', time_per_call(lambda: md(*args)), 'ns')
+
+
+@benchmark
+def statistics():
+    for enabled in (False, True):
+        md, classes = _operator_dispatch(2)
+        if enabled:
+            md.enable_statistics()
+        args = (classes[-1](), classes[-1]())
+        md(*args)
+        kind = 'enabled' if enabled else 'disabled'
+        yield Measurement(GROUP, f'warm call, statistics {kind}', time_per_call(lambda: md(*args)), 'ns')
+
+
+@benchmark
+def batched_map():
+    rows = 10_000
+    md, classes = _operator_dispatch(2)
+    instances = [cls() for cls in classes]
+    streams = {
+        'homogeneous': [(instances[-1], instances[-1])] * rows,
+        'mixed': [(instances[i % len(instances)], instances[(i // 3) % len(instances)]) for i in range(rows)],
+    }
+    for kind, stream in streams.items():
+        md.map(stream)
+
+        def loop():
+            for args in stream:
+                md(*args)
+
+        yield Measurement(GROUP, f'loop of calls, {kind}', time_once(loop) / rows, 'ns')
+        yield Measurement(GROUP, f'map, {kind}', time_once(lambda: md.map(stream)) / rows, 'ns')
+
+
+@benchmark
+def literal_values():
+    for n_values in (4, 64):
+        md = make_dispatch(2)
+        md.register(make_candidate([str, int], 'str'))
+        values = [f'op{i}' for i in range(n_values)]
+        for v in values:
+            md.register(make_candidate([Literal[v], int], v))
+        args = (values[-1], 0)
+        md(*args)
+        yield Measurement(GROUP, f'warm call, {n_values} literal candidates', time_per_call(lambda: md(*args)), 'ns')
+
+
+@benchmark
+def protocols():
+    calls = 500
+    n_candidates = 20
+
+    def method(self):
+        return None
+
+    classes = [type(f'C{i}', (), {f'm{i}': method}) for i in range(n_candidates)]
+    protocol_classes = [
+        runtime_checkable(new_class(f'P{i}', (Protocol,), exec_body=lambda ns, i=i: ns.update({f'm{i}': method})))
+        for i in range(n_candidates)
+    ]
+    kinds = {
+        'concrete classes': (classes, lambda i: type('Leaf', (classes[i],), {})),
+        'protocols': (protocol_classes, lambda i: type('Leaf', (), {f'm{i}': method})),
+    }
+    for kind, (annotations, make_leaf) in kinds.items():
+        md = make_dispatch(1)
+        for i, annotation in enumerate(annotations):
+            md.register(make_candidate([annotation], i))
+        leaves = [make_leaf(i % n_candidates)() for i in range(calls)]
+
+        def call_all():
+            for leaf in leaves:
+                md(leaf)
+
+        yield Measurement(GROUP, f'cold call, {n_candidates} {kind}', time_once(call_all) / calls, 'ns')
+        leaf = leaves[-1]
+        yield Measurement(GROUP, f'warm call, {n_candidates} {kind}', time_per_call(lambda: md(leaf)), 'ns')
+
+
+@benchmark
+def typevar_binding():
+    calls = 500
+    n_candidates = 20
+    # unrelated classes, so that every argument type matches a single candidate
+    classes = [type(f'C{i}', (), {}) for i in range(n_candidates)]
+    kinds = {
+        'concrete classes': [(cls, cls) for cls in classes],
+        'bounded typevars': [(T, T) for T in (TypeVar(f'T{i}', bound=cls) for i, cls in enumerate(classes))],
+        'constrained typevars': [(T, T) for T in (TypeVar(f'T{i}', cls, int) for i, cls in enumerate(classes))],
+    }
+    for kind, signatures in kinds.items():
+        md = make_dispatch(2)
+        for i, signature in enumerate(signatures):
+            md.register(make_candidate(signature, i))
+        leaves = [(leaf(), leaf()) for leaf in (type('Leaf', (classes[i % n_candidates],), {}) for i in range(calls))]
+
+        def call_all():
+            for args in leaves:
+                md(*args)
+
+        yield Measurement(GROUP, f'cold call, {n_candidates} candidates, {kind}', time_once(call_all) / calls, 'ns')
+
+
+@benchmark
+def optional_unions():
+    calls = 500
+    n_candidates = 20
+    classes = [type(f'C{i}', (), {}) for i in range(n_candidates)]
+    md = make_dispatch(2)
+    for i, cls in enumerate(classes):
+        # the ABC makes the candidates inexact, so their union filters are matched for every new type tuple
+        md.register(make_candidate([Optional[cls], Hashable], i))
+    leaves = [(type('Leaf', (classes[i % n_candidates],), {})(), 0) for i in range(calls)]
+
+    def call_all():
+        for args in leaves:
+            md(*args)
+
+    yield Measurement(GROUP, f'cold call, {n_candidates} Optional candidates', time_once(call_all) / calls, 'ns')
+
+
+@benchmark
+def lazy_register():
+    overloads = 1000
+    classes = class_tree(overloads)
+    namespace = {cls.__name__: cls for cls in classes}
+    for lazy in (False, True):
+        md = make_dispatch(2, lazy=lazy)
+        # string annotations, as with `from __future__ import annotations`
+        candidates = [make_candidate([cls.__name__, 'object'], i) for i, cls in enumerate(classes)]
+        kind = 'lazy' if lazy else 'eager'
+
+        def register_all():
+            for c in candidates:
+                md.register(c, extra_namespace=namespace)
+
+        yield Measurement(GROUP, f'register {overloads} overloads, {kind}', time_once(register_all), 'ns')
+        args = (classes[-1](), None)
+        yield Measurement(GROUP, f'first call after registering {overloads} overloads, {kind}',
+                          time_once(lambda: md(*args)), 'ns')
+        yield Measurement(GROUP, f'unrelated arity call after registering {overloads} overloads, {kind}',
+                          time_once(lambda: md(None)), 'ns')
@@ -0,0 +1,61 @@
+from typing import Optional, Union
+
+from tests.benchmarking.registry import benchmark, Measurement, allocated_memory
+from tests.benchmarking.util import make_candidate, make_dispatch, class_tree
+
+GROUP = 'memory'
+
+
+@benchmark
+def lookup_cache_memory():
+    entries = 1000
+    for arity in (1, 2):
+        classes = class_tree(20)
+        md = make_dispatch(arity)
+        for i, cls in enumerate(classes):
+            md.register(make_candidate([cls] * arity, i))
+        md(*(classes[0]() for _ in range(arity)))
+        leaves = [tuple(type('Leaf', (classes[(i + j) % len(classes)],), {})() for j in range(arity))
+                  for i in range(entries)]
+
+        def fill():
+            for args in leaves:
+                md(*args)
+
+        yield Measurement(GROUP, f'lookup cache, bytes per entry, arity {arity}', allocated_memory(fill) / entries,
+                          'bytes')
+
+
+@benchmark
+def bounded_lookup_cache():
+    calls = 2000
+    classes = class_tree(20)
+    for maxsize in (None, 100):
+        md = make_dispatch(1, maxsize=maxsize)
+        for i, cls in enumerate(classes):
+            md.register(make_candidate([cls], i))
+        leaves = [type('Leaf', (classes[i % len(classes)],), {})() for i in range(calls)]
+        for leaf in leaves:
+            md(leaf)
+        info = md.cache_info()
+        yield Measurement(GROUP, f'lookup cache size after {calls} distinct types, maxsize {maxsize}', info.bytes,
+                          'bytes')
+
+
+@benchmark
+def overload_memory():
+    overloads = 2000
+    classes = class_tree(20)
+    annotations = [*classes, Optional[int], Optional[str], Union[classes[1], classes[2], None]]
+    for arity in (1, 2):
+        md = make_dispatch(arity)
+        # the functions are created beforehand, so only the memory of the registration itself is measured
+        funcs = [make_candidate([annotations[(i + j) % len(annotations)] for j in range(arity)], i)
+                 for i in range(overloads)]
+
+        def register_all():
+            for func in funcs:
+                md.register(func)
+
+        yield Measurement(GROUP, f'registration, bytes per overload, arity {arity}',
+                          allocated_memory(register_all) / overloads, 'bytes')
@@ -0,0 +1,58 @@
+from threading import Barrier, Thread
+from time import perf_counter
+
+from tests.benchmarking.registry import benchmark, Measurement
+from tests.benchmarking.util import make_candidate, make_dispatch, class_tree
+
+GROUP = 'threads'
+
+
+def _throughput(md, args_per_thread, threads: int, registrations=()) -> float:
+    """
+    call md with every args tuple from every thread (and register the candidates in registrations from an extra
+     thread meanwhile)
+    :return: the number of calls per second, across all threads
+    """
+    # the main thread is also a party, so that the timing starts once all the threads are released
+    barrier = Barrier(threads + 2)
+
+    def call_all(args_list):
+        barrier.wait()
+        for args in args_list:
+            md(*args)
+
+    def register_all():
+        barrier.wait()
+        for c in registrations:
+            md.register(c)
+
+    workers = [Thread(target=call_all, args=(args_per_thread[i],)) for i in range(threads)]
+    workers.append(Thread(target=register_all))
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = perf_counter()
+    for w in workers:
+        w.join()
+    return sum(len(a) for a in args_per_thread[:threads]) / (perf_counter() - start)
+
+
+@benchmark
+def concurrent_calls():
+    max_threads = 8
+    calls = 20_000
+    for registering in (False, True):
+        for threads in (1, 2, 4, max_threads):
+            classes = class_tree(40)
+            md = make_dispatch(2, thread_safe=True)
+            for i, cls in enumerate(classes[:20]):
+                md.register(make_candidate([cls, cls], i))
+            registrations = [make_candidate([cls, cls], i) for i, cls in enumerate(classes[20:])] \
+                if registering else ()
+            # every thread calls with a mix of cached and new types
+            leaves = [type('Leaf', (cls,), {}) for cls in classes]
+            args_per_thread = [[(leaves[(i * j) % len(leaves)](), leaves[(i + j) % len(leaves)]())
+                                for j in range(calls // threads)] for i in range(max_threads)]
+            kind = ', while registering' if registering else ''
+            yield Measurement(GROUP, f'calls per second, {threads} threads{kind}',
+                              _throughput(md, args_per_thread, threads, registrations), 'calls/s')
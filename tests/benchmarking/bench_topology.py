@@ -0,0 +1,55 @@
+from itertools import islice, product
+from typing import Any, Optional, TypeVar, Union
+
+from dyndis.multidispatch import possible_envelopers
+from dyndis.topological_sort import topological_sort
+from tests.benchmarking.registry import benchmark, Measurement, time_once
+from tests.benchmarking.util import make_candidate, make_dispatch, class_tree
+
+GROUP = 'topology'
+
+SIZES = (10, 100, 1000, 10000)
+
+
+def candidate_set(size: int):
+    """
+    :return: a set of size two-parameter candidates over a shared class tree
+    """
+    classes = class_tree(int(size ** 0.5) + 1)
+    md = make_dispatch(2)
+    for i, (a, b) in enumerate(islice(product(classes, repeat=2), size)):
+        md.register(make_candidate([a, b], i))
+    return md.candidate_sets[2]
+
+
+@benchmark
+def topological_sort_scaling():
+    for size in SIZES:
+        candidates = candidate_set(size)
+        if size <= 1000:
+            yield Measurement(GROUP, f'topological sort, {size} candidates, unindexed',
+                              time_once(lambda: list(topological_sort(candidates))), 'ns')
+        yield Measurement(GROUP, f'topological sort, {size} candidates',
+                          time_once(lambda: list(topological_sort(candidates, possible_envelopers(candidates)))), 'ns')
+
+
+@benchmark
+def mixed_annotations_sort():
+    classes = class_tree(20)
+    annotations = [
+        *classes,
+        *(Optional[cls] for cls in classes),
+        *(Union[a, b] for a, b in zip(classes, classes[5:])),
+        *(TypeVar(f'T{i}', bound=cls) for i, cls in enumerate(classes[::4])),
+        *(TypeVar(f'S{i}', a, b) for i, (a, b) in enumerate(zip(classes[::4], classes[1::4]))),
+        Any,
+    ]
+    for size in (100, 1000):
+        md = make_dispatch(2)
+        for i, (a, b) in enumerate(islice(product(annotations, repeat=2), 0, None, 7)):
+            if i == size:
+                break
+            md.register(make_candidate([a, b], i))
+        candidates = md.candidate_sets[2]
+        yield Measurement(GROUP, f'topological sort, {size} candidates with mixed annotations',
+                          time_once(lambda: list(topological_sort(candidates, possible_envelopers(candidates)))), 'ns')
@@ -0,0 +1,62 @@
+from gc import collect
+from time import perf_counter
+from timeit import Timer
+from tracemalloc import start, stop, take_snapshot, is_tracing
+from typing import Callable, Iterable, List, NamedTuple
+
+BenchmarkFunc = Callable[[], Iterable['Measurement']]
+
+benchmarks: List[BenchmarkFunc] = []
+
+
+class Measurement(NamedTuple):
+    group: str
+    name: str
+    value: float
+    unit: str
+
+    def to_json(self):
+        return self._asdict()
+
+
+def benchmark(func: BenchmarkFunc) -> BenchmarkFunc:
+    """
+    register a benchmark, a benchmark is a function that yields measurements
+    """
+    benchmarks.append(func)
+    return func
+
+
+def time_per_call(func: Callable[[], object], number: int = 10_000, repeat: int = 5) -> float:
+    """
+    :return: the best time (out of repeat) for a single call of func, in nanoseconds
+    """
+    timer = Timer(func)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def time_once(func: Callable[[], object]) -> float:
+    """
+    :return: the time it took to call func a single time, in nanoseconds
+    """
+    start_time = perf_counter()
+    func()
+    return (perf_counter() - start_time) * 1e9
+
+
+def allocated_memory(func: Callable[[], object]) -> float:
+    """
+    :return: the number of bytes allocated by func and still alive after it returns (along with its return value)
+    """
+    was_tracing = is_tracing()
+    collect()
+    if not was_tracing:
+        start()
+    before = take_snapshot()
+    ret = func()
+    collect()
+    after = take_snapshot()
+    if not was_tracing:
+        stop()
+    del ret
+    return sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
@@ -0,0 +1,54 @@
+from functools import lru_cache
+from typing import Any, Callable, List, Sequence
+
+from dyndis import MultiDispatch
+
+
+@lru_cache(None)
+def _candidate_template(arity: int) -> Callable[[Any], Callable]:
+    params = ', '.join(f'a{i}' for i in range(arity))
+    namespace = {}
+    exec(f'def factory(ret):\n'
+         f'    def candidate({params}):\n'
+         f'        return ret\n'
+         f'    return candidate', namespace)
+    return namespace['factory']
+
+
+def make_candidate(annotations: Sequence[Any], ret: Any = None) -> Callable:
+    """
+    create a new function with len(annotations) positional parameters, annotated by annotations, that returns ret
+    """
+    ret_func = _candidate_template(len(annotations))(ret)
+    ret_func.__annotations__ = {f'a{i}': a for i, a in enumerate(annotations)}
+    return ret_func
+
+
+def make_dispatch(arity: int, default_ret: Any = None, **kwargs) -> MultiDispatch:
+    def default(*args):
+        return default_ret
+
+    default.__name__ = f'dispatch_{arity}'
+    return MultiDispatch(default, **kwargs)
+
+
+def class_tree(size: int, branching: int = 3, base: type = object, prefix='C') -> List[type]:
+    """
+    create a list of size new classes, each (except the first) inheriting from one of the classes before it,
+     forming a tree with the given branching factor
+    """
+    ret = [type(f'{prefix}0', (base,), {})]
+    for i in range(1, size):
+        parent = ret[(i - 1) // branching]
+        ret.append(type(f'{prefix}{i}', (parent,), {}))
+    return ret
+
+
+def class_chain(depth: int, base: type = object, prefix='L') -> List[type]:
+    """
+    create a list of depth new classes, each inheriting from the one before it
+    """
+    ret = [type(f'{prefix}0', (base,), {})]
+    for i in range(1, depth):
+        ret.append(type(f'{prefix}{i}', (ret[-1],), {}))
+    return ret
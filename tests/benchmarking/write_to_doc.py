@@ -0,0 +1,100 @@
+import json
+import platform
+import sys
+from argparse import ArgumentParser
+from datetime import datetime
+from importlib import import_module
+from itertools import groupby
+from pathlib import Path
+from typing import List, Sequence
+
+from dyndis import __version__
+from tests.benchmarking.registry import benchmarks, Measurement
+
+BENCHMARK_MODULES = (
+    'tests.benchmarking.bench_dispatch',
+    'tests.benchmarking.bench_topology',
+    'tests.benchmarking.bench_memory',
+    'tests.benchmarking.bench_cache',
+    'tests.benchmarking.bench_threads',
+)
+
+DEFAULT_OUTPUT = Path(__file__).parent.parent.parent / 'doc' / 'source'
+
+
+def make_parser():
+    ret = ArgumentParser(description='run the dyndis benchmarks and write the results to the documentation')
+    ret.add_argument('--output', type=Path, default=DEFAULT_OUTPUT,
+                     help='directory to write benchmarks.json and benchmarks.rst to')
+    ret.add_argument('-k', dest='filter', default=None,
+                     help='only run benchmarks whose function name contains this string')
+    return ret
+
+
+def run(name_filter=None) -> List[Measurement]:
+    for module in BENCHMARK_MODULES:
+        import_module(module)
+
+    ret = []
+    for bench in benchmarks:
+        if name_filter and name_filter not in bench.__name__:
+            continue
+        for measurement in bench():
+            print(f'{measurement.group}: {measurement.name}: {measurement.value:,.1f} {measurement.unit}',
+                  file=sys.stderr)
+            ret.append(measurement)
+    return ret
+
+
+def to_json(measurements: Sequence[Measurement]):
+    return {
+        'dyndis_version': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'results': [m.to_json() for m in measurements],
+    }
+
+
+def to_rst(document) -> str:
+    lines = [
+        'Benchmarks',
+        '==========',
+        '',
+        f'dyndis {document["dyndis_version"]}, {document["implementation"]} {document["python"]}'
+        f' on {document["platform"]} ({document["timestamp"]})',
+        '',
+    ]
+    for group, results in groupby(document['results'], key=lambda r: r['group']):
+        lines.extend([
+            group,
+            '-' * len(group),
+            '',
+            '.. list-table::',
+            '   :header-rows: 1',
+            '',
+            '   * - benchmark',
+            '     - result',
+        ])
+        for r in results:
+            lines.append(f'   * - {r["name"]}')
+            lines.append(f'     - {r["value"]:,.1f} {r["unit"]}')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def main(args=None):
+    parser = make_parser()
+    args = parser.parse_args(args)
+
+    document = to_json(run(args.filter))
+
+    output: Path = args.output
+    output.mkdir(parents=True, exist_ok=True)
+    (output / 'benchmarks.json').write_text(json.dumps(document, indent=2))
+    (output / 'benchmarks.rst').write_text(to_rst(document))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+from asyncio import run, sleep
+from functools import wraps
+
+from pytest import raises
+
+from dyndis import AsyncMultiDispatch, AmbiguityError
+
+
+def test_async_basic():
+    @AsyncMultiDispatch
+    async def foo(*args):
+        return 'default'
+
+    @foo.register
+    async def _(a: int):
+        await sleep(0)
+        return 'int'
+
+    @foo.register
+    async def _(a: bool):
+        return NotImplemented
+
+    @foo.register
+    def _(a: str):
+        return 'str'
+
+    assert run(foo(1)) == 'int'
+    assert run(foo(True)) == 'int'
+    assert run(foo('a')) == 'str'
+    assert run(foo(1.0)) == 'default'
+    assert run(foo(1)) == 'int'
+    assert foo.cache_info().hits == 1
+
+
+def test_async_fallthrough():
+    @AsyncMultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    async def _(a: object):
+        return NotImplemented
+
+    @foo.register
+    async def _(a: int):
+        return NotImplemented
+
+    assert run(foo(1)) == 'default'
+    assert run(foo(1)) == 'default'
+
+
+def test_async_wrapped_candidates():
+    def sync_wrapper(func):
+        @wraps(func)
+        def ret(*args, **kwargs):
+            return func(*args, **kwargs)
+
+        return ret
+
+    @AsyncMultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    @sync_wrapper
+    async def _(a: int):
+        return 'int'
+
+    @foo.register
+    @sync_wrapper
+    async def _(a: bool):
+        return NotImplemented
+
+    assert run(foo(1)) == 'int'
+    assert run(foo(True)) == 'int'
+    assert run(foo(1.0)) == 'default'
+
+
+def test_async_ambiguity():
+    @AsyncMultiDispatch
+    async def foo(*args):
+        return 'default'
+
+    @foo.register
+    async def _(a: int, b: object):
+        return 0
+
+    @foo.register
+    async def _(a: object, b: int):
+        return 1
+
+    with raises(AmbiguityError):
+        run(foo(1, 1))
+
+
+def test_async_method():
+    @AsyncMultiDispatch
+    async def add(self, other):
+        return NotImplemented
+
+    class A:
+        __add__ = add
+
+        @add.implement(__qualname__)
+        async def add_int(self, other: int):
+            return other + 1
+
+    assert run(A() + 1) == 2
+    assert run(A() + 'a') is NotImplemented
+
+
+def test_async_statistics():
+    @AsyncMultiDispatch
+    async def foo(*args):
+        return 'default'
+
+    @foo.register
+    async def _(a: int):
+        return NotImplemented
+
+    foo.enable_statistics()
+    assert run(foo(1)) == 'default'
+    assert run(foo(1)) == 'default'
+    stats = foo.statistics()
+    assert stats['calls'] == 2
+    assert stats['hits'] == 1
+    assert stats['fallthrough_depths'] == {1: 2}
+    assert stats['candidate_calls'] == {'foo<int>': 2}
+    assert stats['default_calls'] == 2
+
+
+def test_async_map():
+    @AsyncMultiDispatch
+    async def foo(*args):
+        return 'default'
+
+    @foo.register
+    async def _(a: int):
+        return a + 1
+
+    assert run(foo.map([(1,), ('a',), (2,)])) == [2, 'default', 3]
+    assert run(foo.map_columns([1, 'a'])) == [2, 'default']
@@ -0,0 +1,78 @@
+from abc import ABC
+from typing import Any, TypeVar, Union
+
+from dyndis.annotation_filter import annotation_filter
+from dyndis.dispatch_index import DispatchIndex, indexable_classes, superset_terms
+
+
+class A:
+    pass
+
+
+class B(A):
+    pass
+
+
+class C:
+    pass
+
+
+class Abstract(ABC):
+    pass
+
+
+T = TypeVar('T')
+
+
+class FakeCandidate:
+    def __init__(self, *annotations, initial_definitions=None):
+        self.filters = tuple(annotation_filter(a) for a in annotations)
+        self.initial_definitions = initial_definitions or {}
+
+
+def test_indexable_classes():
+    assert indexable_classes(annotation_filter(A)) == {A}
+    assert indexable_classes(annotation_filter(Union[A, C])) == {A, C}
+    assert indexable_classes(annotation_filter(Union[A, T])) is None
+    assert indexable_classes(annotation_filter(Abstract)) is None
+    assert indexable_classes(annotation_filter(Any)) is None
+    assert indexable_classes(annotation_filter(T)) is None
+
+
+def test_applicable():
+    index = DispatchIndex(2)
+    a_a = FakeCandidate(A, A)
+    b_c = FakeCandidate(B, C)
+    a_any = FakeCandidate(A, Any)
+    abstract = FakeCandidate(Abstract, Union[A, C])
+    for c in (a_a, b_c, a_any):
+        index.add(c)
+    assert index.exact == {a_a, b_c}
+    assert set(index.applicable((B, B))) == {a_a, a_any}
+    assert set(index.applicable((B, C))) == {b_c, a_any}
+    assert set(index.applicable((C, C))) == set()
+
+    # memoized entries are updated by new candidates
+    index.add(abstract)
+    assert set(index.applicable((B, C))) == {b_c, a_any, abstract}
+    assert set(index.applicable((C, C))) == {abstract}
+    assert set(index.applicable((C, int))) == set()
+
+
+def test_typevar_superset():
+    bounded = TypeVar('bounded', bound=A)
+    constrained = TypeVar('constrained', B, C)
+    assert superset_terms(annotation_filter(bounded)) == ({A}, set())
+    assert superset_terms(annotation_filter(Union[constrained, None])) == ({B, C, type(None)}, set())
+    assert superset_terms(annotation_filter(Abstract)) is None
+
+    index = DispatchIndex(2)
+    bounded_bounded = FakeCandidate(bounded, bounded)
+    constrained_a = FakeCandidate(constrained, A)
+    defined = FakeCandidate(bounded, A, initial_definitions={bounded: annotation_filter(C)})
+    for c in (bounded_bounded, constrained_a, defined):
+        index.add(c)
+    assert index.exact == set()
+    assert set(index.applicable((B, A))) == {bounded_bounded, constrained_a, defined}
+    assert set(index.applicable((C, B))) == {constrained_a, defined}
+    assert set(index.applicable((int, A))) == {defined}
@@ -0,0 +1,232 @@
+from asyncio import run
+from enum import Enum
+from gc import collect
+from operator import attrgetter
+from types import SimpleNamespace
+from typing import Optional, Union
+from weakref import ref
+
+from pytest import raises, skip
+
+from dyndis import MultiDispatch, AsyncMultiDispatch, AmbiguityError
+from dyndis.annotation_filter import annotation_filter
+from dyndis.multidispatch import _LazyResolution
+
+try:
+    from typing import Literal
+except ImportError:
+    skip('typing.Literal is not available', allow_module_level=True)
+
+
+def test_literal():
+    @MultiDispatch
+    def op(*args):
+        return 'default'
+
+    @op.register
+    def _(name: str, x: int):
+        return f'str {x}'
+
+    @op.register
+    def _(name: Literal['add'], x: int):
+        return x + 1
+
+    @op.register
+    def _(name: Literal['sub'], x: int):
+        return x - 1
+
+    @op.register
+    def _(name: Literal['sub', 'neg'], x: int):
+        return -x
+
+    @op.register
+    def _(name: Literal[1], x: object):
+        return 'one'
+
+    @op.register
+    def _(name: Optional[Literal['skip']], x: int):
+        return NotImplemented
+
+    assert op('add', 1) == 2
+    assert op('sub', 1) == 0
+    assert op('neg', 1) == -1
+    assert op('mul', 1) == 'str 1'
+    assert op('skip', 1) == 'str 1'
+    assert op(None, 1) == 'default'
+    assert op(1, 1) == 'one'
+    assert op(True, 1) == 'default'
+    assert op(2, 1) == 'default'
+    assert op('add', 'a') == 'default'
+    # all the values of the same types share a lookup
+    assert op.cache_info().misses == 5
+    assert op('add', 1) == 2
+    assert op('sub', 1) == 0
+    assert op.map([('add', 1), ('neg', 2), ('mul', 3)]) == [2, -2, 'str 3']
+
+
+def test_literal_ambiguity():
+    @MultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    def _(a: Literal['a', 'b']):
+        return 'ab'
+
+    @foo.register
+    def _(a: Literal['b', 'c']):
+        return 'bc'
+
+    assert foo('a') == 'ab'
+    assert foo('c') == 'bc'
+    with raises(AmbiguityError):
+        foo('b')
+
+
+def test_async_literal():
+    @AsyncMultiDispatch
+    async def foo(*args):
+        return 'default'
+
+    @foo.register
+    async def _(a: Literal['a']):
+        return 'a'
+
+    assert run(foo('a')) == 'a'
+    assert run(foo('b')) == 'default'
+
+
+def test_literal_envelops():
+    ab = annotation_filter(Literal['a', 'b'])
+    assert ab.envelops(annotation_filter(Literal['a']))
+    assert not annotation_filter(Literal['a']).envelops(ab)
+    assert annotation_filter(str).envelops(ab)
+    assert not ab.envelops(annotation_filter(str))
+    assert annotation_filter(Union[Literal['a'], int]).envelops(annotation_filter(Literal['a']))
+    assert annotation_filter(Union[Literal['a'], Literal['b'], int]).envelops(ab)
+    assert not annotation_filter(Literal[1]).envelops(annotation_filter(Literal[True]))
+
+
+def test_literal_atoms():
+    ab = annotation_filter(Literal['a', 'b'])
+    assert ab.atoms() is ab.atoms()
+    assert ab.atoms() == {annotation_filter(Literal['a']), annotation_filter(Literal['b'])}
+    # the atoms are interned
+    assert any(a is annotation_filter(Literal['a']) for a in ab.atoms())
+    one = annotation_filter(Literal[1])
+    assert one.atoms() == {one}
+
+
+def test_literal_lookups_weak():
+    @MultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    def _(a: object, b: Literal[1]):
+        return 'one'
+
+    @foo.register
+    def _(a: object, b: int):
+        return 'int'
+
+    classes = [type(f'C{i}', (), {}) for i in range(50)]
+    refs = [ref(cls) for cls in classes]
+    assert [foo(cls(), 1) for cls in classes] == ['one'] * 50
+    assert len(foo._lookup_cache) == 50
+    del classes
+    collect()
+    assert all(r() is None for r in refs)
+    assert len(foo._lookup_cache) == 0
+
+
+def test_literal_fallthrough_memoized():
+    @MultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    def _(a: Literal['a', 'b']):
+        return NotImplemented
+
+    @foo.register
+    def _(a: str):
+        return 'str'
+
+    assert foo('a') == 'str'
+    switch, = foo._lookup_cache[str, ]
+    # the resolution that was extended past the NotImplemented is written back into the switch
+    resolution = switch.by_values['a', ]
+    assert not any(isinstance(c, _LazyResolution) for c in resolution)
+    assert foo('a') == 'str'
+    assert switch.by_values['a', ] is resolution
+    assert foo('b') == 'str'
+    assert foo.map([('a',), ('b',), ('c',)]) == ['str'] * 3
+    assert not any(isinstance(c, _LazyResolution) for r in switch.by_values.values() for c in r)
+
+
+def test_literal_unrelated_types():
+    class Foo:
+        pass
+
+    @MultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    def _(a: Literal['a']):
+        return 'a'
+
+    @foo.register
+    def _(a: int):
+        return 'int'
+
+    @foo.register
+    def _(a: Foo):
+        return 'foo'
+
+    # the Literal candidate is indexed by its values' types, so other types are resolved without a value switch
+    assert foo(1) == 'int'
+    assert not any(isinstance(c, _LazyResolution) for c in foo._lookup_cache[int, ])
+    assert len(foo._dispatch_indices[1].applicable((int,))) == 1
+    instances = [Foo() for _ in range(5)]
+    refs = [ref(i) for i in instances]
+    assert [foo(i) for i in instances] == ['foo'] * 5
+    del instances
+    collect()
+    assert not any(r() for r in refs)
+    assert foo('a') == 'a'
+    assert foo('b') == 'default'
+
+
+def test_literal_key_extractors():
+    class Color(Enum):
+        red = 1
+        blue = 2
+
+    def default(*args):
+        return 'default'
+
+    foo = MultiDispatch(default, key_extractors=[attrgetter('color'), attrgetter('version')])
+
+    @foo.register
+    def _(a: Literal[Color.red]):
+        return 'red'
+
+    @foo.register
+    def _(a: Color):
+        return 'color'
+
+    @foo.register
+    def _(a: Color, b: Literal[2]):
+        return 'v2'
+
+    @foo.register
+    def _(a: Color, b: int):
+        return 'version'
+
+    assert foo(SimpleNamespace(color=Color.red)) == 'red'
+    assert foo(SimpleNamespace(color=Color.blue)) == 'color'
+    assert foo(SimpleNamespace(color=Color.red), SimpleNamespace(version=2)) == 'v2'
+    assert foo(SimpleNamespace(color=Color.red), SimpleNamespace(version=3)) == 'version'
+    assert foo.map([(SimpleNamespace(color=Color.red),), (SimpleNamespace(color=Color.blue),)]) == ['red', 'color']
@@ -1,8 +1,11 @@
+from gc import collect
+from sys import version_info
 from typing import Union, Sequence, TypeVar, Sized, Hashable, Optional, Callable
+from weakref import ref
 
-from pytest import raises
+from pytest import mark, raises
 
-from dyndis.annotation_filter import annotation_filter
+from dyndis.annotation_filter import annotation_filter, UnionAnnotationFilter, _interned
 
 
 def match(ann, x, defined=None):
@@ -28,6 +31,24 @@ def test_union_many():
     assert match(Union[object, int], bool)
 
 
+def test_union_is_not_a_class():
+    # in python 3.10+, unions are type-like, but must not be treated as classes
+    u = annotation_filter(Union[int, str])
+    assert isinstance(u, UnionAnnotationFilter)
+    assert u.envelops(annotation_filter(int))
+    assert not annotation_filter(int).envelops(u)
+
+
+@mark.skipif(version_info < (3, 10), reason='X | Y unions require python 3.10+')
+def test_union_operator():
+    u = annotation_filter(int | str)
+    assert isinstance(u, UnionAnnotationFilter)
+    assert match(int | str, str)
+    assert not match(int | str, float)
+    assert u.envelops(annotation_filter(int))
+    assert not annotation_filter(int).envelops(u)
+
+
 def test_union_with_tv():
     T = TypeVar('T', str, bool)
     assert match(Union[int, T], int)
@@ -96,4 +117,52 @@ def test_callable():
         def __call__(self):
             pass
 
-    assert match(Callable, A)
\ No newline at end of file
+    assert match(Callable, A)
+
+
+def test_interned():
+    T = TypeVar('T')
+    assert annotation_filter(int) is annotation_filter(int)
+    assert annotation_filter(Optional[str]) is annotation_filter(Union[None, str])
+    assert annotation_filter(T) is annotation_filter(T)
+    assert annotation_filter(Union[int, T]).args == {annotation_filter(int), annotation_filter(T)}
+
+    class A:
+        pass
+
+    f = annotation_filter(A)
+    assert _interned[type(f), A] is f
+    del f
+    collect()
+    assert (type(annotation_filter(int)), A) not in _interned
+
+
+def test_union_normalized():
+    T = TypeVar('T', bound=bool)
+    assert annotation_filter(Union[int, bool]) is annotation_filter(int)
+    assert annotation_filter(Union[int, bool, None]) is annotation_filter(Optional[int])
+    assert annotation_filter(Union[Sized, str, int]).args == {annotation_filter(Sized), annotation_filter(int)}
+    # members with TypeVars are kept, even if they are enveloped
+    assert annotation_filter(Union[int, T]).args == {annotation_filter(int), annotation_filter(T)}
+
+    plain = annotation_filter(Optional[int])
+    assert set(plain._classes) == {int, type(None)}
+    assert match(Optional[int], bool)
+    assert not match(Optional[int], str)
+    assert annotation_filter(Union[Sequence, int])._classes is not None
+    assert annotation_filter(Union[T, str])._classes is None
+
+
+def test_envelops_memo_weak():
+    class A:
+        pass
+
+    r = ref(A)
+    obj = annotation_filter(object)
+    assert obj.envelops(annotation_filter(A))
+    assert not annotation_filter(A).envelops(obj)
+    # the memoized results do not keep the other filter (or its class) alive
+    del A
+    collect()
+    assert r() is None
+    assert obj.envelops(annotation_filter(int))
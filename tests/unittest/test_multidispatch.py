@@ -1,9 +1,19 @@
-from abc import ABC
+from abc import ABC, abstractmethod
+from enum import Enum
+from functools import partial, update_wrapper
+from gc import collect
+from itertools import product
+from operator import attrgetter
+from random import Random
+from sys import getswitchinterval, setswitchinterval
+from threading import Thread
+from types import SimpleNamespace
 from typing import Union, TypeVar
+from weakref import ref
 
 from pytest import raises
 
-from dyndis import MultiDispatch, AmbiguityError
+from dyndis import MultiDispatch, AmbiguityError, FrozenDispatchError, TraceEvent
 
 
 def test_basic_onearg():
@@ -142,3 +152,946 @@ def test_abc_register():
     A.register(B)
 
     assert foo(b) == 1
+
+
+def test_arities():
+    @MultiDispatch
+    def foo(*args, **kwargs):
+        return None
+
+    @foo.register
+    def _():
+        return 0
+
+    @foo.register
+    def _(a: int, **kwargs):
+        return 1, kwargs
+
+    @foo.register
+    def _(a: int, b: int):
+        return 2
+
+    @foo.register
+    def _(a: int, b: int, c: int):
+        return 3
+
+    @foo.register
+    def _(a: int, b: int, c: int, d: int):
+        return 4
+
+    @foo.register
+    def _(a: int, b: int, c: int, d: int, e: int):
+        return 5
+
+    assert foo() == 0
+    assert foo(0, x=1) == (1, {'x': 1})
+    for i in range(2, 6):
+        assert foo(*range(i)) == i
+        assert foo(*range(i)) == i
+        assert foo(*range(i - 1), 'a') is None
+    assert foo(*range(6)) is None
+
+
+def test_dispatcher_attributes():
+    def foo(*args):
+        """foo's documentation"""
+        return 0
+
+    md = update_wrapper(MultiDispatch(foo), foo)
+    assert md.__doc__ == "foo's documentation"
+    assert md.__wrapped__ is foo
+    assert md.__qualname__ == foo.__qualname__
+    md.tag = 'tag'
+    assert md.tag == 'tag'
+    assert md() == 0
+
+
+def test_shared_filters_weak():
+    def default(x):
+        return None
+
+    kept = MultiDispatch(default)
+    kept.register(lambda x: 0, default_annotations={'x': object})
+    assert kept(1) == 0
+    refs = []
+    for i in range(10):
+        cls = type(f'C{i}', (), {})
+        refs.append(ref(cls))
+        foo = MultiDispatch(default)
+        foo.register(lambda x: 0, default_annotations={'x': object})
+        foo.register(lambda x: 1, default_annotations={'x': cls})
+        assert foo(cls()) == 1
+    del foo, cls
+    collect()
+    # the object filter is shared by all the dispatchers, but does not keep the classes it was compared to alive
+    assert not any(r() for r in refs)
+
+
+def test_fallthrough_to_default():
+    @MultiDispatch
+    def foo(x):
+        return 'default'
+
+    @foo.register
+    def _(x: int):
+        return NotImplemented
+
+    @foo.register
+    def _(x: bool):
+        return NotImplemented
+
+    assert foo(True) == 'default'
+    assert foo(True) == 'default'
+
+
+def test_register_after_call():
+    @MultiDispatch
+    def foo(*args):
+        return 0
+
+    @foo.register
+    def _(x: int, y: object):
+        return 1
+
+    assert foo(1, 1) == 1
+    assert foo(1) == 0
+
+    @foo.register
+    def _(x: int, y: int):
+        return 2
+
+    assert foo(1, 1) == 2
+    assert foo(1, 'a') == 1
+
+
+def test_abc_register_concrete_cache_kept():
+    class A(ABC):
+        pass
+
+    class B:
+        pass
+
+    @MultiDispatch
+    def foo(*args):
+        return 0
+
+    @foo.register
+    def _(a: int):
+        return 1
+
+    assert foo(1) == 1
+    resolution = foo._lookup_cache.get((int,))
+    A.register(B)
+    assert foo(1) == 1
+    assert foo._lookup_cache.get((int,)) is resolution
+
+
+def test_abc_register_unrelated_lookup_kept():
+    class A(ABC):
+        pass
+
+    class B:
+        pass
+
+    @MultiDispatch
+    def foo(*args):
+        return 0
+
+    @foo.register
+    def _(a: A):
+        return 1
+
+    @foo.register
+    def _(a: int):
+        return 2
+
+    b = B()
+    assert foo(1) == 2
+    assert foo(b) == 0
+    resolution = foo._lookup_cache.get((int,))
+    A.register(B)
+    assert foo(b) == 1
+    assert foo(1) == 2
+    assert foo._lookup_cache.get((int,)) is resolution
+
+
+def test_abc_register_topology():
+    class A(ABC):
+        pass
+
+    class C:
+        pass
+
+    class D(C):
+        pass
+
+    @MultiDispatch
+    def foo(*args):
+        return 0
+
+    @foo.register
+    def _(a: A):
+        return 1
+
+    @foo.register
+    def _(a: C):
+        return NotImplemented
+
+    assert foo(D()) == 0
+    A.register(C)
+    assert foo(D()) == 1
+
+
+def test_abc_register_bound_typevar():
+    class A(ABC):
+        pass
+
+    class B:
+        pass
+
+    T = TypeVar('T')
+
+    @MultiDispatch
+    def foo(*args):
+        return 0
+
+    @foo.register
+    def _(a: T, b: T):
+        return 1
+
+    assert foo(A(), B()) == 0
+    A.register(B)
+    assert foo(A(), B()) == 1
+
+
+def _new_classes(n):
+    return [type(f'C{i}', (), {}) for i in range(n)]
+
+
+def test_cache_info():
+    @MultiDispatch
+    def foo(*args):
+        return 0
+
+    @foo.register
+    def _(a: int):
+        return 1
+
+    assert foo.cache_info()[:5] == (0, 0, None, 0, 0)
+    assert foo(1) == 1
+    assert foo(2) == 1
+    assert foo('a') == 0
+    assert foo(1, 2, 3, 4, 5) == 0
+    assert foo(1, 2, 3, 4, 5) == 0
+    info = foo.cache_info()
+    assert info.hits == 2
+    assert info.misses == 3
+    assert info.currsize == 3
+    assert info.evictions == 0
+    assert info.bytes > 0
+
+
+def test_maxsize():
+    def foo(*args):
+        return 0
+
+    foo = MultiDispatch(foo, maxsize=4)
+
+    @foo.register
+    def _(a: object):
+        return 1
+
+    classes = _new_classes(10)
+    instances = [c() for c in classes]
+    for i in instances:
+        assert foo(i) == 1
+    info = foo.cache_info()
+    assert info.currsize <= 4
+    assert info.misses == 10
+    assert info.evictions == 6
+
+    # the most recent lookups are kept
+    for i in instances[-2:]:
+        assert foo(i) == 1
+    assert foo.cache_info().misses == 10
+    # recently used lookups are promoted, and are kept
+    for i in instances[:4]:
+        foo(i)
+        foo(instances[-1])
+    assert foo.cache_info().misses == 14
+    assert foo.cache_info().currsize <= 4
+
+
+def test_maxsize_small():
+    def foo(*args):
+        return 0
+
+    classes = _new_classes(3)
+    for maxsize, expected_size in ((0, 0), (1, 1)):
+        md = MultiDispatch(foo, maxsize=maxsize)
+
+        @md.register
+        def _(a: int):
+            return 1
+
+        for c in classes:
+            assert md(c()) == 0
+            assert md(1) == 1
+        info = md.cache_info()
+        assert info.currsize == expected_size
+        assert info.misses == 6
+
+    with raises(ValueError):
+        MultiDispatch(foo, maxsize=-1)
+
+
+def test_register_incremental():
+    class A:
+        pass
+
+    class B(A):
+        pass
+
+    class C(B):
+        pass
+
+    class D(A):
+        pass
+
+    signatures = [(A, A), (B, A), (A, B), (C, object), (object, D), (B, B), (D, D), (object, object)]
+    values = [(x(), y()) for x in (A, B, C, D) for y in (A, B, C, D)]
+
+    def candidate(index):
+        def ret(a, b):
+            return index if index % 3 else NotImplemented
+
+        ret.__annotations__ = dict(zip('ab', signatures[index]))
+        return ret
+
+    def results(md):
+        ret = []
+        for args in values:
+            try:
+                ret.append(md(*args))
+            except AmbiguityError:
+                ret.append('ambiguous')
+        return ret
+
+    rand = Random(0)
+    for _ in range(20):
+        order = list(range(len(signatures)))
+        rand.shuffle(order)
+
+        @MultiDispatch
+        def incremental(*args):
+            return None
+
+        for i, index in enumerate(order):
+            incremental.register(candidate(index))
+            actual = results(incremental)
+
+            @MultiDispatch
+            def full(*args):
+                return None
+
+            for prev in order[:i + 1]:
+                full.register(candidate(prev))
+            assert actual == results(full)
+
+
+def test_register_keeps_unrelated_lookups():
+    @MultiDispatch
+    def foo(*args):
+        return 0
+
+    @foo.register
+    def _(a: int):
+        return 1
+
+    assert foo(1) == 1
+    assert foo('a') == 0
+    resolution = foo._lookup_cache.get((int,))
+
+    @foo.register
+    def _(a: str):
+        return 2
+
+    assert foo._lookup_cache.get((int,)) is resolution
+    assert foo('a') == 2
+    assert foo(1) == 1
+
+
+def test_lazy_resolution():
+    class A:
+        pass
+
+    class B(A):
+        pass
+
+    class C(B):
+        pass
+
+    implemented = {A, B, C}
+
+    @MultiDispatch
+    def foo(x):
+        return 'default'
+
+    @foo.register
+    def _(x: A):
+        return 'A' if A in implemented else NotImplemented
+
+    @foo.register
+    def _(x: B):
+        return 'B' if B in implemented else NotImplemented
+
+    @foo.register
+    def _(x: C):
+        return 'C' if C in implemented else NotImplemented
+
+    c = C()
+    assert foo(c) == 'C'
+    # only the first candidate was resolved
+    assert len(foo._lookup_cache.get((C,))) == 2
+    implemented.remove(C)
+    assert foo(c) == 'B'
+    assert len(foo._lookup_cache.get((C,))) == 3
+    implemented.clear()
+    assert foo(c) == 'default'
+    resolution = foo._lookup_cache.get((C,))
+    assert len(resolution) == 4
+    assert resolution[-1] is foo.default_callback
+    assert foo(c) == 'default'
+    implemented.add(A)
+    assert foo(c) == 'A'
+    assert foo._lookup_cache.get((C,)) is resolution
+
+
+def test_lazy_resolution_error():
+    @MultiDispatch
+    def foo(x):
+        return 'default'
+
+    @foo.register
+    def _(x: bool):
+        return NotImplemented
+
+    @foo.register
+    def _(x: Union[int, str]):
+        return 1
+
+    @foo.register
+    def _(x: Union[int, float]):
+        return 2
+
+    assert foo(1.0) == 2
+    with raises(AmbiguityError):
+        foo(True)
+    with raises(AmbiguityError):
+        foo(True)
+
+
+def test_many_overloads():
+    classes = [type(f'C{i}', (), {}) for i in range(10)]
+    subclasses = [type(f'S{i}', (cls,), {}) for i, cls in enumerate(classes)]
+
+    @MultiDispatch
+    def foo(*args):
+        return None
+
+    def candidate(a, b):
+        def ret(x: a, y: b):
+            return a.__name__, b.__name__
+
+        return ret
+
+    for a in classes:
+        for b in classes[:5]:
+            foo.register(candidate(a, b))
+        foo.register(candidate(a, object))
+
+    assert foo(subclasses[2](), subclasses[3]()) == ('C2', 'C3')
+    assert foo(subclasses[2](), subclasses[7]()) == ('C2', 'object')
+    assert foo(classes[9](), 0) == ('C9', 'object')
+    assert foo(0, 0) is None
+
+
+def test_prime():
+    class A:
+        pass
+
+    class B(A):
+        pass
+
+    class C(B):
+        pass
+
+    class D(ABC):
+        @abstractmethod
+        def foo(self):
+            pass
+
+    @MultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    def _(a: A, b: A):
+        return NotImplemented
+
+    @foo.register
+    def _(a: A, b: object):
+        return 'A, object'
+
+    @foo.register
+    def _(a: D):
+        return 'D'
+
+    assert foo.prime([(B, int)]) == 1
+    assert foo.cache_info().currsize == 1
+    # the entire resolution is resolved
+    assert foo.cache_info().misses == 1
+    assert foo(C(), C()) == 'A, object'
+    assert foo(B(), 1) == 'A, object'
+    assert foo.cache_info().misses == 2
+
+    foo.clear_cache()
+    # the (A, A) candidate contributes A, B, and C to both positions, the (A, object) candidate contributes object to
+    # the second position, D is abstract
+    assert foo.prime(subclasses=True) == 3 * 4
+    info = foo.cache_info()
+    assert foo(C(), C()) == 'A, object'
+    assert foo(B(), object()) == 'A, object'
+    assert foo.cache_info().misses == info.misses
+
+
+def test_freeze():
+    @MultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    def _(a: int):
+        return 'int'
+
+    @foo.register
+    def _(a: int, b: str):
+        return 'int, str'
+
+    assert not foo.frozen
+    foo.freeze()
+    assert foo.frozen
+    assert foo._layers_cache.keys() == {1, 2}
+    assert foo(1) == 'int'
+    assert foo(1, 'a') == 'int, str'
+    assert foo('a') == 'default'
+
+    with raises(FrozenDispatchError):
+        @foo.register
+        def _(a: str):
+            return 'str'
+
+    with raises(FrozenDispatchError):
+        foo.implement('key')
+    assert foo('a') == 'default'
+
+
+def test_thread_safe():
+    classes = [type(f'C{i}', (), {}) for i in range(50)]
+    errors = []
+
+    def default(*args):
+        return None
+
+    foo = MultiDispatch(default, thread_safe=True)
+
+    def candidate(cls, index):
+        def ret(a: cls, b: object):
+            return index
+
+        return ret
+
+    def register_all():
+        for i, cls in enumerate(classes):
+            foo.register(candidate(cls, i))
+
+    def call_all(seed):
+        random = Random(seed)
+        try:
+            for _ in range(2000):
+                i = random.randrange(len(classes))
+                # a new subclass every call, so that most calls resolve a new lookup
+                ret = foo(type('Leaf', (classes[i],), {})(), None)
+                assert ret in (None, i)
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [Thread(target=register_all)] + [Thread(target=call_all, args=(seed,)) for seed in range(4)]
+    # switch threads as often as possible, to make races likely
+    switch_interval = getswitchinterval()
+    setswitchinterval(1e-6)
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        setswitchinterval(switch_interval)
+    assert not errors
+    assert all(foo(cls(), None) == i for i, cls in enumerate(classes))
+
+
+def test_frozen_thread_safe():
+    classes = [type(f'C{i}', (), {}) for i in range(50)]
+    errors = []
+
+    @MultiDispatch
+    def foo(*args):
+        return None
+
+    def candidate(cls, index):
+        def ret(a: cls, b: object):
+            return index
+
+        return ret
+
+    for i, cls in enumerate(classes):
+        foo.register(candidate(cls, i))
+    foo.freeze()
+    leaves = [type('Leaf', (classes[i % len(classes)],), {}) for i in range(2000)]
+
+    def call_all(seed):
+        random = Random(seed)
+        try:
+            for _ in range(2000):
+                i = random.randrange(len(leaves))
+                assert foo(leaves[i](), None) == i % len(classes)
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    threads = [Thread(target=call_all, args=(seed,)) for seed in range(4)]
+    switch_interval = getswitchinterval()
+    setswitchinterval(1e-6)
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        setswitchinterval(switch_interval)
+    assert not errors
+    # every type tuple was resolved exactly once
+    info = foo.cache_info()
+    assert info.misses == info.currsize == len(foo._lookup_keys(2))
+
+
+def test_statistics():
+    @MultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    def _(a: int):
+        return 'int'
+
+    @foo.register
+    def _(a: bool):
+        return NotImplemented
+
+    @foo.register
+    def _(a: str):
+        return 'str'
+
+    assert foo.statistics() is None
+    foo(1)
+    foo.enable_statistics()
+    foo(1)
+    foo(True)
+    foo(True)
+    foo(1.0)
+    stats = foo.statistics()
+    assert stats['calls'] == 4
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+    assert stats['fallthrough_depths'] == {0: 2, 1: 2}
+    assert stats['candidate_calls'] == {'foo<int>': 3, 'foo<bool>': 2, 'foo<str>': 0}
+    assert stats['candidate_not_implemented'] == {'foo<int>': 0, 'foo<bool>': 2, 'foo<str>': 0}
+    assert stats['default_calls'] == 1
+    assert stats['resolution_time'] > 0
+    assert stats['body_time'] > 0
+    assert foo.cache_info().hits == 2
+
+    foo.disable_statistics()
+    foo(1)
+    assert foo.statistics() is None
+    assert foo.cache_info().hits == 3
+
+
+def test_hooks():
+    @MultiDispatch
+    def foo(*args):
+        return 'default'
+
+    @foo.register
+    def _(a: int):
+        return NotImplemented
+
+    @foo.register
+    def _(a: int, b: object):
+        return 0
+
+    @foo.register
+    def _(a: object, b: int):
+        return 1
+
+    events = []
+
+    def hook(event, dispatch, t_args, candidate):
+        assert dispatch is foo
+        events.append((event, t_args, candidate and str(candidate)))
+
+    foo(1)
+    foo.add_hook(hook)
+    foo(1)
+    assert events == [
+        (TraceEvent.candidate_attempted, (int,), 'foo<int>'),
+        (TraceEvent.candidate_not_implemented, (int,), 'foo<int>'),
+        (TraceEvent.default_used, (int,), None),
+    ]
+    events.clear()
+    with raises(AmbiguityError):
+        foo(1, 1)
+    assert events == [
+        (TraceEvent.cache_miss, (int, int), None),
+        (TraceEvent.topology_rebuild, None, None),
+        (TraceEvent.ambiguity, (int, int), None),
+    ]
+    events.clear()
+    foo.remove_hook(hook)
+    foo(1)
+    assert not events
+
+    MultiDispatch.add_global_hook(hook)
+    try:
+        foo('a')
+    finally:
+        MultiDispatch.remove_global_hook(hook)
+    assert events == [
+        (TraceEvent.cache_miss, (str,), None),
+        (TraceEvent.default_used, (str,), None),
+    ]
+    events.clear()
+    foo('a')
+    assert not events
+
+
+def test_map():
+    @MultiDispatch
+    def foo(*args, sep=''):
+        return 'default'
+
+    @foo.register
+    def _(a: int, b: int, **kwargs):
+        return f'{a}{kwargs.get("sep", "")}{b}'
+
+    @foo.register
+    def _(a: bool, b: str, **kwargs):
+        return NotImplemented if a else 'bool'
+
+    rows = [(1, 2), (True, 1), ('a', 'b'), (False, 'x'), (3, 4), (True, 'y')]
+    assert foo.map(rows, sep=',') == ['1,2', 'True,1', 'default', 'bool', '3,4', 'default']
+    assert foo.map(rows) == [foo(*r) for r in rows]
+    assert foo.map_columns([1, 'a'], [2, 'b']) == ['12', 'default']
+    assert foo.map([]) == []
+    assert foo.map([(1, 2), (1,), (1, 2, 3)]) == ['12', 'default', 'default']
+    # (int, int), (bool, int), (str, str), (bool, str), (int,), (int, int, int) were resolved once each
+    assert foo.cache_info().misses == 6
+
+
+def test_map_hits():
+    def default(*args):
+        return 'default'
+
+    foo = MultiDispatch(default, maxsize=4)
+    instances = [c() for c in _new_classes(3)]
+    for i in instances:
+        foo(i)
+    assert foo.cache_info()[:2] == (0, 3)
+    # the first lookup is in the old generation
+    assert foo.map([(instances[0],)]) == ['default']
+    assert foo.cache_info()[:2] == (1, 3)
+    assert foo.map([(instances[0],), (instances[0],), (1,)]) == ['default'] * 3
+    assert foo.cache_info()[:2] == (3, 4)
+
+
+def test_key_extractors():
+    class V1:
+        pass
+
+    class V2(V1):
+        pass
+
+    class Message:
+        def __init__(self, schema):
+            self.schema = schema
+
+    def default(*args):
+        return 'default'
+
+    foo = MultiDispatch(default, key_extractors=[attrgetter('schema')])
+
+    @foo.register
+    def _(m: V1, x: int):
+        return 'v1'
+
+    @foo.register
+    def _(m: V2, x: int):
+        return NotImplemented if x else 'v2'
+
+    assert foo(Message(V1), 1) == 'v1'
+    assert foo(Message(V2), 0) == 'v2'
+    assert foo(Message(V2), 1) == 'v1'
+    assert foo(Message(V2), 'a') == 'default'
+    assert foo(Message(int), 1) == 'default'
+    assert foo.cache_info().hits == 1
+    assert foo.map([(Message(V1), 1), (Message(V2), 0)]) == ['v1', 'v2']
+
+    foo.enable_statistics()
+    assert foo(Message(V2), 1) == 'v1'
+    assert foo.statistics()['hits'] == 1
+
+
+def test_key_extractor_values():
+    class Color(Enum):
+        red = 1
+
+    def default(*args):
+        return 'default'
+
+    def color_of(x):
+        return x.color
+
+    foo = MultiDispatch(default, key_extractors=[None, color_of, attrgetter('version')])
+
+    @foo.register
+    def _(a: object, b: Color):
+        return 'color'
+
+    @foo.register
+    def _(a: object, b: Color, c: int):
+        return 'version'
+
+    # values that are not classes are dispatched by their types
+    assert foo(0, SimpleNamespace(color=Color.red)) == 'color'
+    assert foo(0, SimpleNamespace(color=Color.red), SimpleNamespace(version=3)) == 'version'
+    assert foo(0, SimpleNamespace(color=Color.red), SimpleNamespace(version='3')) == 'default'
+    # extracted classes are still dispatched by themselves
+    assert foo(0, SimpleNamespace(color=int)) == 'default'
+    assert foo.map([(0, SimpleNamespace(color=Color.red)), (0, SimpleNamespace(color=int))]) == ['color', 'default']
+
+
+def test_compiled_match():
+    class A:
+        pass
+
+    class B(A):
+        pass
+
+    class C:
+        pass
+
+    T = TypeVar('T')
+    S = TypeVar('S', A, C)
+    U = TypeVar('U', bound=A)
+    types = (A, B, C, int, bool)
+    signatures = [(T, T, int), (U, T, U), (S, S, S), (S, B, U), (int, S, T), (Union[T, None], T, S)]
+
+    @MultiDispatch
+    def foo(*args):
+        return None
+
+    for signature in signatures:
+        foo.register(lambda a, b, c: None, default_annotations=dict(zip('abc', signature)))
+    # nested TypeVars are matched with a mapping of definitions
+    assert sum(c._steps is None for c in foo.candidate_sets[3]) == 1
+    for candidate in foo.candidate_sets[3]:
+        for t_args in product(types, repeat=3):
+            try:
+                expected = candidate._match_definitions(t_args)
+            except TypeError:
+                with raises(TypeError):
+                    candidate.match(t_args)
+            else:
+                assert candidate.match(t_args) == expected
+
+
+def test_lazy():
+    @MultiDispatch
+    def eager(x):
+        return 'default'
+
+    @partial(MultiDispatch, lazy=True)
+    def foo(*args):
+        return 'default'
+
+    namespace = {}
+
+    def later(x: 'Later'):
+        return 'later'
+
+    # the forward reference cannot be resolved yet
+    with raises(NameError):
+        eager.register(later, extra_namespace=namespace)
+
+    @foo.register
+    def _(x: int):
+        return 'int'
+
+    foo.register(later, extra_namespace=namespace)
+
+    @foo.register
+    def _(x: int, y: int):
+        return 'int, int'
+
+    assert not foo.candidate_sets
+
+    # a registration that still cannot be resolved fails the first dispatch of its arity, and stays pending
+    with raises(NameError):
+        foo(1)
+    assert len(foo.candidate_sets[1]) == 1
+
+    class Later:
+        pass
+
+    namespace['Later'] = Later
+    assert foo(1) == 'int'
+    assert foo(Later()) == 'later'
+    assert len(foo.candidate_sets[1]) == 2
+    assert not foo.candidate_sets[2]
+
+    # registrations of dispatched arities are not deferred
+    @foo.register
+    def _(x: str):
+        return 'str'
+
+    assert len(foo.candidate_sets[1]) == 3
+    assert foo('') == 'str'
+
+    foo.freeze()
+    assert len(foo.candidate_sets[2]) == 1
+    assert foo(1, 1) == 'int, int'
+
+
+def test_lazy_implementors():
+    @partial(MultiDispatch, lazy=True)
+    def foo(self, other):
+        return None
+
+    class A:
+        @foo.implement(__qualname__)
+        def _(self, other: 'A'):
+            return 'A'
+
+    assert not foo.candidate_sets
+    assert foo(A(), A()) == 'A'
+    assert foo(A(), 1) is None
@@ -0,0 +1,211 @@
+from typing import Optional
+
+from pytest import mark, skip
+
+from dyndis import MultiDispatch
+from dyndis.annotation_filter import ClassAnnotationFilter, ProtocolAnnotationFilter, annotation_filter
+
+try:
+    from typing import Protocol, runtime_checkable
+except ImportError:
+    skip('typing.Protocol is not available', allow_module_level=True)
+
+
+@runtime_checkable
+class SupportsQuack(Protocol):
+    def quack(self):
+        pass
+
+
+@runtime_checkable
+class SupportsQuackAndWalk(SupportsQuack, Protocol):
+    def walk(self):
+        pass
+
+
+@runtime_checkable
+class HasName(Protocol):
+    name: str
+
+
+class Duck:
+    def quack(self):
+        return 'quack'
+
+    def walk(self):
+        return 'waddle'
+
+
+class Robot:
+    def quack(self):
+        return 'beep'
+
+
+class Mute(Robot):
+    quack = None
+
+
+class Person:
+    name: str = 'bob'
+
+
+def test_protocol_filter():
+    f = annotation_filter(SupportsQuack)
+    assert isinstance(f, ProtocolAnnotationFilter)
+    assert f.match(Duck, {})
+    assert f.match(Robot, {})
+    assert not f.match(Mute, {})
+    assert not f.match(int, {})
+    # structural verdicts are cached
+    assert f._verdicts[Duck] is True
+    assert f._verdicts[int] is False
+
+    assert isinstance(annotation_filter(HasName), ProtocolAnnotationFilter)
+    assert annotation_filter(HasName).match(Person, {})
+    assert not annotation_filter(HasName).match(Duck, {})
+
+
+def test_protocol_envelops():
+    quack = annotation_filter(SupportsQuack)
+    quack_walk = annotation_filter(SupportsQuackAndWalk)
+    assert quack.envelops(quack_walk)
+    assert not quack_walk.envelops(quack)
+    assert quack.envelops(annotation_filter(Duck))
+    assert quack_walk.envelops(annotation_filter(Duck))
+    assert not quack_walk.envelops(annotation_filter(Robot))
+    assert annotation_filter(object).envelops(quack)
+    assert not annotation_filter(Duck).envelops(quack)
+    assert annotation_filter(Optional[SupportsQuack]).envelops(quack_walk)
+
+
+def test_protocol_dispatch():
+    @MultiDispatch
+    def describe(x):
+        return 'default'
+
+    @describe.register
+    def _(x: object):
+        return 'object'
+
+    @describe.register
+    def _(x: SupportsQuack):
+        return 'quacks'
+
+    @describe.register
+    def _(x: SupportsQuackAndWalk):
+        return 'quacks and walks'
+
+    @describe.register
+    def _(x: Duck):
+        return 'duck'
+
+    @describe.register
+    def _(x: HasName):
+        return 'named'
+
+    assert describe(Duck()) == 'duck'
+    assert describe(Robot()) == 'quacks'
+    assert describe(Mute()) == 'object'
+    assert describe(Person()) == 'named'
+    assert describe(1) == 'object'
+    # classes can be registered to SupportsQuack, so the ABC cache token is tracked
+    assert not describe._is_abc_static()
+
+
+@mark.parametrize('thread_safe', [False, True])
+def test_protocol_exact(thread_safe):
+    @MultiDispatch
+    def foo(a, b):
+        return 'default'
+
+    @foo.register
+    def _(a: SupportsQuack, b: Optional[SupportsQuack]):
+        return 'quack'
+
+    @foo.register
+    def _(a: int, b: int):
+        return 'int'
+
+    index = foo._dispatch_indices[2]
+    assert set(index.exact) == foo.candidate_sets[2]
+    assert foo(Robot(), None) == 'quack'
+    assert foo(Robot(), Duck()) == 'quack'
+    assert foo(1, 1) == 'int'
+    assert foo(Robot(), 1) == 'default'
+
+    # protocol candidates that are added later are added to the memoized masks
+    @foo.register
+    def _(a: object, b: SupportsQuack):
+        return 'object'
+
+    assert foo(1, Robot()) == 'object'
+    assert foo(Robot(), 1) == 'default'
+
+
+def test_protocol_register():
+    @runtime_checkable
+    class SupportsHonk(Protocol):
+        def honk(self):
+            pass
+
+    @runtime_checkable
+    class HasHorn(Protocol):
+        horn: str
+
+    class Goose:
+        pass
+
+    class Car:
+        pass
+
+    @MultiDispatch
+    def foo(a):
+        return 'default'
+
+    @foo.register
+    def _(a: SupportsHonk):
+        return 'honk'
+
+    @foo.register
+    def _(a: HasHorn):
+        return 'horn'
+
+    assert not annotation_filter(HasHorn).registrable
+    assert foo(Goose()) == 'default'
+    assert foo(Car()) == 'default'
+    SupportsHonk.register(Goose)
+    assert foo(Goose()) == 'honk'
+    assert foo(Car()) == 'default'
+    # the structural verdicts are not affected by the registration
+    assert annotation_filter(SupportsHonk)._verdicts[Goose] is False
+
+
+def test_protocol_subclasshook():
+    @runtime_checkable
+    class SupportsSize(Protocol):
+        def size(self):
+            pass
+
+        @classmethod
+        def __subclasshook__(cls, other):
+            if getattr(other, 'sized', False):
+                return True
+            return NotImplemented
+
+    class Box:
+        sized = True
+
+    @MultiDispatch
+    def foo(a):
+        return 'default'
+
+    @foo.register
+    def _(a: SupportsSize):
+        return 'size'
+
+    assert foo(Box()) == 'size'
+    assert foo(1) == 'default'
+
+
+def test_plain_class_filter_unchanged():
+    assert type(annotation_filter(Duck)) is ClassAnnotationFilter
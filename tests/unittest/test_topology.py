@@ -1,6 +1,12 @@
+from abc import ABC
+from collections.abc import Sized, Hashable
+from random import Random
 from typing import Union, TypeVar, Any
 
+from dyndis import MultiDispatch
 from dyndis.annotation_filter import annotation_filter
+from dyndis.multidispatch import possible_envelopers
+from dyndis.topological_sort import topological_sort, topological_insert
 
 
 def cmp(a, b):
@@ -123,3 +129,78 @@ def test_any():
     assert cmp(Any, Union[A, B]) > 0
     assert cmp(Any, Any) is None
     assert cmp(Any, object) > 0
+
+
+def test_union_with_typevar():
+    T = TypeVar('T', bound=B)
+    S = TypeVar('S', C, D)
+    assert cmp(Union[T, G], T) > 0
+    assert cmp(Union[S, G], Union[S, T]) == 0
+    assert cmp(Union[A, G], Union[T, S]) > 0
+
+
+def test_all_pairs():
+    T = TypeVar('T', bound=B)
+    S = TypeVar('S', C, Union[D, G])
+    annotations = [A, B, G, Sized, Union[B, G], Union[T, G], T, S, Any, type(None), Union[S, None]]
+    for a in annotations:
+        for b in annotations:
+            # envelops is defined for every pair of filters
+            cmp(a, b)
+        assert cmp(a, a) is None
+        assert cmp(Any, a) in (None, 1)
+
+
+def test_envelops_abc_register():
+    class Abstract(ABC):
+        pass
+
+    class Concrete:
+        pass
+
+    assert cmp(Abstract, Concrete) == 0
+    Abstract.register(Concrete)
+    assert cmp(Abstract, Concrete) > 0
+
+
+class SubsetMember:
+    def __init__(self, *items):
+        self.items = frozenset(items)
+
+    def envelops(self, other):
+        return self.items > other.items
+
+
+def test_topological_insert():
+    rand = Random(0)
+    for _ in range(200):
+        items = {frozenset(rand.sample(range(5), rand.randint(0, 5))) for _ in range(rand.randint(1, 12))}
+        members = [SubsetMember(*i) for i in items]
+        rand.shuffle(members)
+        layers = list(topological_sort(members[:1]))
+        for i in range(1, len(members)):
+            moved = topological_insert(layers, members[i])
+            assert members[i] in moved
+            assert layers == list(topological_sort(members[:i + 1]))
+
+
+def test_possible_envelopers():
+    T = TypeVar('T', bound=B)
+    annotations = [A, B, C, D, E, F, G, object, Any, Union[B, C], Union[D, G], T, Sized, Hashable]
+    rand = Random(0)
+
+    @MultiDispatch
+    def foo(*args):
+        pass
+
+    for _ in range(60):
+        x, y = rand.choice(annotations), rand.choice(annotations)
+
+        def cand(a, b):
+            pass
+
+        cand.__annotations__ = {'a': x, 'b': y}
+        foo.register(cand)
+
+    candidates = foo.candidate_sets[2]
+    assert list(topological_sort(candidates)) == list(topological_sort(candidates, possible_envelopers(candidates)))
@@ -0,0 +1,144 @@
+from gc import collect, get_threshold, set_threshold
+from weakref import ref
+
+from pytest import raises
+
+from dyndis.typetuplecache import TypeTupleCache
+
+
+def new_class():
+    class A:
+        pass
+
+    return A
+
+
+def test_ttc():
+    ttc = TypeTupleCache()
+    a = new_class()
+    b = new_class()
+    r_b = ref(b)
+    ttc[a, b] = 0
+    assert len(ttc) == 1
+    assert ttc[a, b] == 0
+    assert ttc.get((a, a), None) is None
+    assert ttc.get((a,), None) is None
+    assert ttc.get((a, b)) == 0
+    assert (a, b) in ttc
+    del b
+    collect()
+    assert r_b() is None
+    assert len(ttc) == 0
+    assert ttc.keys() == []
+
+
+def test_double_del():
+    ttc = TypeTupleCache()
+    a = new_class()
+    b = new_class()
+    r_a = ref(a)
+    r_b = ref(b)
+    ttc[a, b] = 0
+    ttc[b, a] = 1
+    ttc[a, a, a] = 2
+    assert len(ttc) == 3
+    del b
+    collect()
+    assert r_b() is None
+    assert len(ttc) == 1
+    del a
+    collect()
+    assert r_a() is None
+    assert len(ttc) == 0
+
+
+def test_same_tuple():
+    ttc = TypeTupleCache()
+    a = new_class()
+    r_a = ref(a)
+    ttc[a, a] = 0
+    assert len(ttc) == 1
+    del a
+    collect()
+    assert r_a() is None
+    assert len(ttc) == 0
+
+
+def test_keys_and_del():
+    ttc = TypeTupleCache()
+    a = new_class()
+    b = new_class()
+    ttc[a, b] = 0
+    ttc[a, a] = 1
+    ttc[b, ] = 2
+    ttc[()] = 3
+    assert set(ttc.keys()) == {(a, b), (a, a), (b,), ()}
+    del ttc[a, b]
+    assert set(ttc.keys()) == {(a, a), (b,), ()}
+    with raises(KeyError):
+        del ttc[a, b]
+    assert ttc.pop((a, a)) == 1
+    assert ttc.pop((a, a), 'missing') == 'missing'
+    assert ttc.pop(()) == 3
+    assert ttc.keys() == [(b,)]
+    del b
+    collect()
+    assert len(ttc) == 0
+
+
+def test_overwrite_and_clear():
+    ttc = TypeTupleCache()
+    a = new_class()
+    ttc[a, int] = 0
+    ttc[a, int] = 1
+    assert len(ttc) == 1
+    assert ttc[a, int] == 1
+    root = ttc.root(2)
+    ttc.clear()
+    assert len(ttc) == 0
+    assert ttc.root(2) is root
+    assert not root
+    with raises(KeyError):
+        ttc[a, int]
+
+
+def test_root_lookup():
+    ttc = TypeTupleCache()
+    a = new_class()
+    ttc[a, int] = 0
+    assert ttc.root(2)[ref(a)][ref(int)] == 0
+
+
+def test_cache_dies():
+    ttc = TypeTupleCache()
+    a = new_class()
+    ttc[a, ] = 0
+    r_ttc = ref(ttc)
+    del ttc
+    collect()
+    assert r_ttc() is None
+    del a
+    collect()
+
+
+def test_removal_during_iteration():
+    ttc = TypeTupleCache()
+    kept = [new_class() for _ in range(10)]
+    for a in kept:
+        ttc[a, ] = 0
+    threshold = get_threshold()
+    # classes are always in reference cycles, so they die during collections, which run during allocations
+    set_threshold(1)
+    try:
+        for _ in range(100):
+            dying = [new_class() for _ in range(10)]
+            for d in dying:
+                ttc[d, kept[0]] = 1
+            del dying, d
+            assert set(ttc.keys()) >= {(a,) for a in kept}
+            ttc.approximate_size()
+    finally:
+        set_threshold(*threshold)
+    collect()
+    assert len(ttc) == len(kept)
+    assert len(ttc.keys()) == len(kept)